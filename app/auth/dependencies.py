@@ -2,9 +2,11 @@ from fastapi.security import OAuth2PasswordBearer
 from fastapi import HTTPException, Depends, status
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.config import SECRET_KEY, ALGORITHM
 from app.dependencies import get_async_db
 from app.models.users_model import User as UserModel, UserRole
+from app.repositories.user_repo import UserRepo
+from app.schemas.users import AuthUser
+from app.auth.token_cache import verified_tokens
 from sqlalchemy import select
 
 import jwt
@@ -13,14 +15,14 @@ import jwt
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl='users/token')
 
 
-async def get_current_user(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_async_db)):
+async def get_current_user(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_async_db)) -> AuthUser:
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail='Could not validate credentials',
         headers={"WWW_Authenticate": "Bearer"}
     )
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        payload = verified_tokens.decode(token)
         email: str = payload.get('sub')
         if not email:
             raise credentials_exception
@@ -29,20 +31,31 @@ async def get_current_user(token: str = Depends(oauth2_scheme), db: AsyncSession
                             detail='Token has expired',
                             headers={"WWW_Authenticate": "Bearer"})
     except jwt.InvalidTokenError:
-        raise credentials_exception  
+        raise credentials_exception
+
+    user_id, version = payload.get('id'), payload.get('ver')
+    if isinstance(user_id, int) and isinstance(version, int):
+        # The user's state comes from read_cache, usually without a query.
+        # Deactivation bumps token_version, which revokes the token.
+        user = await UserRepo(db).get_auth_user(user_id)
+        if not user or not user.is_active or user.token_version != version:
+            raise credentials_exception
+        return user
+
+    # tokens issued before the "ver" claim existed
     user = await db.scalar(select(UserModel).where(UserModel.email == email,
                                                    UserModel.is_active.is_(True)))
     if not user:
         raise credentials_exception
-    return user
+    return AuthUser.model_validate(user)
 
 
 
 def get_current_user_with_role(necessary_role: UserRole):
-    async def dependency(current_user: UserModel = Depends(get_current_user)):
+    async def dependency(current_user: AuthUser = Depends(get_current_user)):
 
         if current_user.role.value != necessary_role.value:
             raise HTTPException(status_code=status.HTTP_403_FORBIDDEN,
                              detail=f'Only {necessary_role.value} can perform this action')
         return current_user
-    return dependency
\ No newline at end of file
+    return dependency
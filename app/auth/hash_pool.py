@@ -0,0 +1,84 @@
+import asyncio
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable
+
+from fastapi import HTTPException, status
+
+from app import metrics
+from app.config import PASSWORD_HASH_WORKERS, PASSWORD_HASH_QUEUE_TIMEOUT
+
+
+def _percentile(samples, q: float) -> float | None:
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    return round(ordered[min(len(ordered) - 1, int(q * len(ordered)))], 2)
+
+
+class PasswordHashPool:
+    """
+    Runs bcrypt off the event loop on a dedicated thread pool.
+
+    bcrypt releases the GIL, so `workers` hashes run in parallel while the
+    loop keeps serving other requests. At most `workers` calls are handed
+    to the pool, the rest wait on a semaphore; a call that waited longer
+    than `queue_timeout` seconds is refused with 503 instead of piling up
+    behind a login spike.
+    """
+
+    def __init__(self, workers: int, queue_timeout: float):
+        self.workers = workers
+        self.queue_timeout = queue_timeout
+        self.waiting = 0
+        self.running = 0
+        self.completed = 0
+        self.rejected = 0
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='password-hash')
+        self._slots = asyncio.Semaphore(workers)
+        # recent latencies in ms, for the percentiles in stats()
+        self._wait_ms: deque[float] = deque(maxlen=1024)
+        self._hash_ms: deque[float] = deque(maxlen=1024)
+
+    async def run(self, func: Callable[..., Any], *args) -> Any:
+        queued_at = time.perf_counter()
+        self.waiting += 1
+        try:
+            await asyncio.wait_for(self._slots.acquire(), timeout=self.queue_timeout)
+        except asyncio.TimeoutError:
+            self.rejected += 1
+            raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                                detail='Too many authentication requests, try again later',
+                                headers={'Retry-After': '1'})
+        finally:
+            self.waiting -= 1
+
+        started_at = time.perf_counter()
+        self._wait_ms.append((started_at - queued_at) * 1000)
+        self.running += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._executor, func, *args)
+        finally:
+            self.running -= 1
+            self.completed += 1
+            self._hash_ms.append((time.perf_counter() - started_at) * 1000)
+            self._slots.release()
+
+    def stats(self) -> dict:
+        return {
+            'workers': self.workers,
+            'queue_depth': self.waiting,
+            'running': self.running,
+            'completed': self.completed,
+            'rejected': self.rejected,
+            'wait_ms_p50': _percentile(self._wait_ms, 0.5),
+            'wait_ms_p95': _percentile(self._wait_ms, 0.95),
+            'hash_ms_p50': _percentile(self._hash_ms, 0.5),
+            'hash_ms_p95': _percentile(self._hash_ms, 0.95),
+        }
+
+
+password_hash_pool = PasswordHashPool(workers=PASSWORD_HASH_WORKERS, queue_timeout=PASSWORD_HASH_QUEUE_TIMEOUT)
+
+metrics.register('password_hash', password_hash_pool.stats)
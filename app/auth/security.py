@@ -1,9 +1,15 @@
 from passlib.context import CryptContext
 
 from datetime import datetime, timedelta, timezone
+from typing import Awaitable, Callable
+import asyncio
+import time
 import jwt
 
+from app import metrics
 from app.config import SECRET_KEY, ALGORITHM
+from app.auth.hash_pool import password_hash_pool
+from app.logger import logger
 
 
 pwd_context = CryptContext(schemes=['bcrypt'], deprecated='auto')
@@ -13,11 +19,82 @@ REFRESH_TOKEN_EXPIRE_DAYS = 7
 
 
 
-def hash_password(password: str) -> str:
-    return pwd_context.hash(password)
+# bcrypt's own limits for the cost factor
+BCRYPT_MAX_ROUNDS = 31
+BCRYPT_LOWEST_ROUNDS = 4
 
-def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return pwd_context.verify(plain_password, hashed_password)
+bcrypt_rounds = pwd_context.handler('bcrypt').default_rounds
+rehashes = 0
+_rehash_tasks: set[asyncio.Task] = set()
+
+
+
+def calibrate_bcrypt_rounds(target_ms: float, min_rounds: int, max_rounds: int = 16) -> int:
+    """
+    Highest cost factor whose hash takes at most `target_ms` on this
+    machine, but not below `min_rounds`. Every extra round doubles the
+    time, so one measurement at `min_rounds` is extrapolated.
+    """
+    context = CryptContext(schemes=['bcrypt'], bcrypt__default_rounds=min_rounds)
+    context.hash('calibration')  # loads the backend
+    elapsed_ms = min(_time_hash(context) for _ in range(3))
+
+    rounds = min_rounds
+    while rounds < max_rounds and elapsed_ms * 2 <= target_ms:
+        rounds += 1
+        elapsed_ms *= 2
+    return rounds
+
+def _time_hash(context: CryptContext) -> float:
+    started = time.perf_counter()
+    context.hash('calibration')
+    return (time.perf_counter() - started) * 1000
+
+def configure_bcrypt(rounds: int):
+    """
+    New hashes use `rounds`. Stored hashes with a lower cost (or of a
+    deprecated scheme) report needs_update() and are rehashed on login.
+    """
+    global bcrypt_rounds
+    if not BCRYPT_LOWEST_ROUNDS <= rounds <= BCRYPT_MAX_ROUNDS:
+        raise ValueError(f'Invalid bcrypt rounds: {rounds}')
+    pwd_context.update(bcrypt__default_rounds=rounds, bcrypt__min_rounds=rounds)
+    bcrypt_rounds = rounds
+    logger.info(f'bcrypt cost factor {rounds}')
+
+def password_needs_rehash(hashed_password: str) -> bool:
+    return pwd_context.needs_update(hashed_password)
+
+def rehash_in_background(password: str, store: Callable[[str], Awaitable[None]]):
+    """
+    Hashes `password` with the current policy in a task of its own, the
+    caller does not wait for it, and passes the new hash to `store`.
+    Failures are only logged, the old hash keeps working.
+    """
+    async def rehash():
+        global rehashes
+        try:
+            await store(await hash_password(password))
+            rehashes += 1
+        except Exception:
+            logger.exception('Password rehash failed')
+
+    task = asyncio.create_task(rehash())
+    _rehash_tasks.add(task)
+    task.add_done_callback(_rehash_tasks.discard)
+
+def password_stats() -> dict:
+    return {'bcrypt_rounds': bcrypt_rounds, 'rehashes': rehashes, 'rehashes_running': len(_rehash_tasks)}
+
+metrics.register('password_policy', password_stats)
+
+
+
+async def hash_password(password: str) -> str:
+    return await password_hash_pool.run(pwd_context.hash, password)
+
+async def verify_password(plain_password: str, hashed_password: str) -> bool:
+    return await password_hash_pool.run(pwd_context.verify, plain_password, hashed_password)
 
 def create_access_token(data: dict):
     to_encode = data.copy()
@@ -0,0 +1,84 @@
+import hashlib
+import time
+from collections import OrderedDict
+from types import MappingProxyType
+from typing import Mapping
+
+import jwt
+
+from app import metrics
+from app.config import SECRET_KEY, ALGORITHM, JWT_CACHE_SIZE, JWT_CACHE_SKEW
+
+
+class VerifiedTokenCache:
+    """
+    LRU of JWTs whose signature and claims were already verified, so a
+    token presented again skips parsing and the HMAC check.
+
+    Keys are blake2b digests of the token, the token itself is not kept.
+    An entry is served until `skew` seconds before the token's exp; the
+    deadline is kept on the monotonic clock, so a wall clock stepping back
+    cannot stretch it. Expired entries are dropped when looked up or when
+    they reach the LRU end, there is no sweeping.
+    Only successful decodes are cached, errors are raised each time.
+    """
+
+    def __init__(self, maxsize: int, skew: float):
+        self.maxsize = maxsize
+        self.skew = skew
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.evictions = 0
+        self._data: OrderedDict[bytes, tuple[float, Mapping]] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def decode(self, token: str) -> Mapping:
+        """
+        jwt.decode with this app's key and algorithm, returning a read-only
+        payload.
+        """
+        key = hashlib.blake2b(token.encode(), digest_size=16).digest()
+        entry = self._data.get(key)
+        if entry is not None:
+            if entry[0] > time.monotonic():
+                self._data.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            del self._data[key]
+            self.expired += 1
+
+        self.misses += 1
+        payload = MappingProxyType(jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM]))
+
+        exp = payload.get('exp')
+        if isinstance(exp, (int, float)):
+            ttl = exp - time.time() - self.skew
+            if ttl > 0:
+                self._data[key] = (time.monotonic() + ttl, payload)
+                if len(self._data) > self.maxsize:
+                    self._data.popitem(last=False)
+                    self.evictions += 1
+        return payload
+
+    def clear(self):
+        self._data.clear()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            'size': len(self._data),
+            'maxsize': self.maxsize,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_ratio': round(self.hits / lookups, 4) if lookups else None,
+            'expired': self.expired,
+            'evictions': self.evictions,
+        }
+
+
+verified_tokens = VerifiedTokenCache(maxsize=JWT_CACHE_SIZE, skew=JWT_CACHE_SKEW)
+
+metrics.register('jwt_cache', verified_tokens.stats)
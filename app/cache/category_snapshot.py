@@ -0,0 +1,134 @@
+import asyncio
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from types import MappingProxyType
+from typing import Mapping
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app import metrics
+from app.config import CATEGORY_SNAPSHOT_CHECK_INTERVAL
+from app.models.products_model import Product as ProductModel
+from app.repositories.categories_repo import CategoryRepo
+
+
+@dataclass(frozen=True, slots=True)
+class CategoryView:
+    id: int
+    name: str
+    is_active: bool
+    version: int
+    updated_at: datetime
+
+
+@dataclass(frozen=True, slots=True)
+class CategorySnapshot:
+    """
+    All categories at one point in time. Never mutated, a change produces
+    a new snapshot, so readers need no locking.
+    """
+
+    token: tuple
+    by_id: Mapping[int, CategoryView]
+    active: tuple[CategoryView, ...]
+    inactive: tuple[CategoryView, ...]
+    inactive_ids: frozenset[int]
+
+    @classmethod
+    def build(cls, token: tuple, categories) -> 'CategorySnapshot':
+        views = sorted(
+            (CategoryView(c.id, c.name, c.is_active, c.version, c.updated_at) for c in categories),
+            key=lambda view: view.id
+        )
+        return cls(
+            token=token,
+            by_id=MappingProxyType({view.id: view for view in views}),
+            active=tuple(view for view in views if view.is_active),
+            inactive=tuple(view for view in views if not view.is_active),
+            inactive_ids=frozenset(view.id for view in views if not view.is_active),
+        )
+
+    def is_active(self, category_id: int) -> bool:
+        category = self.by_id.get(category_id)
+        return category is not None and category.is_active
+
+    def active_filter(self, column) -> list:
+        """
+        Filters that keep rows of active categories only, to be used instead
+        of joining categories. Usually all categories are active and there
+        is nothing to filter.
+        """
+        return [column.not_in(self.inactive_ids)] if self.inactive_ids else []
+
+
+class CategorySnapshotHolder:
+    """
+    Process-wide holder of the current CategorySnapshot.
+
+    At most every `check_interval` seconds a reader compares the snapshot's
+    token with the categories' version token (count and sum of versions,
+    one tiny aggregate) and reloads on a change. Writes in this process
+    call mark_dirty() so they are visible here right away; other workers
+    see them after the next check.
+    """
+
+    def __init__(self, check_interval: float):
+        self.check_interval = check_interval
+        self.checks = 0
+        self.reloads = 0
+        self._snapshot: CategorySnapshot | None = None
+        self._checked_at = 0.0
+        self._dirty = True
+        self._lock = asyncio.Lock()
+
+    def _fresh(self) -> bool:
+        return (self._snapshot is not None and not self._dirty
+                and time.monotonic() - self._checked_at < self.check_interval)
+
+    async def current(self, db: AsyncSession) -> CategorySnapshot:
+        if self._fresh():
+            return self._snapshot
+
+        async with self._lock:
+            if self._fresh():
+                return self._snapshot
+
+            repo = CategoryRepo(db)
+            dirty, self._dirty = self._dirty, False
+            try:
+                token = await repo.get_version_token()
+                self.checks += 1
+                if dirty or self._snapshot is None or token != self._snapshot.token:
+                    self._snapshot = CategorySnapshot.build(token, await repo.get_all_categories(active=None))
+                    self.reloads += 1
+            except BaseException:
+                self._dirty = self._dirty or dirty
+                raise
+            self._checked_at = time.monotonic()
+            return self._snapshot
+
+    def mark_dirty(self):
+        self._dirty = True
+
+    def stats(self) -> dict:
+        snapshot = self._snapshot
+        return {
+            'categories': len(snapshot.by_id) if snapshot else 0,
+            'checks': self.checks,
+            'reloads': self.reloads,
+        }
+
+
+category_snapshot = CategorySnapshotHolder(check_interval=CATEGORY_SNAPSHOT_CHECK_INTERVAL)
+
+metrics.register('category_snapshot', category_snapshot.stats)
+
+
+async def active_category_filter(db: AsyncSession) -> list:
+    """
+    Filters on ProductModel.category_id that replace a join on active
+    categories.
+    """
+    snapshot = await category_snapshot.current(db)
+    return snapshot.active_filter(ProductModel.category_id)
@@ -0,0 +1,97 @@
+from typing import Awaitable, Callable
+
+from sqlalchemy import event, select, func
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.cache.read_through import read_cache
+from app.cache.category_snapshot import category_snapshot
+from app.cache.product_cache import invalidate_product_listing
+from app.cache.notify_bus import ALL, get_bus
+from app.logger import logger
+
+
+# Tags collected on a session are applied to the caches only once the
+# transaction commits: evicting earlier would let a concurrent reader
+# cache the old row again, and a rollback changes nothing.
+#
+# Tags in use: 'product:{id}', 'category:{id}', 'review:{id}',
+# 'user:{id}', 'products' (products imported in bulk),
+# 'product_search' (a product may have started matching searches) and
+# 'categories' (any category change).
+_TAGS_KEY = 'cache_invalidation_tags'
+
+
+def invalidate_on_commit(db: AsyncSession, *tags: str):
+    """
+    Registers cache tags (e.g. 'product:42') to be invalidated when the
+    current transaction of `db` commits, here and, through the
+    invalidation bus, in every other worker.
+    """
+    db.sync_session.info.setdefault(_TAGS_KEY, set()).update(tags)
+
+
+@event.listens_for(Session, 'before_commit')
+def _publish_before_commit(session: Session):
+    # Part of the transaction being committed: other workers are notified
+    # only if and when it commits.
+    bus = get_bus()
+    tags = session.info.get(_TAGS_KEY)
+    if bus is None or not tags:
+        return
+    for payload in bus.payloads(tags):
+        session.execute(select(func.pg_notify(bus.channel, payload)))
+
+
+@event.listens_for(Session, 'after_commit')
+def _invalidate_after_commit(session: Session):
+    tags = session.info.pop(_TAGS_KEY, None)
+    if tags:
+        read_cache.invalidate(tags)
+
+
+@event.listens_for(Session, 'after_soft_rollback')
+def _discard_after_rollback(session: Session, previous_transaction):
+    if previous_transaction.parent is None:
+        session.info.pop(_TAGS_KEY, None)
+
+
+def remote_invalidation_handler(refresh_suggest_entries: Callable[[set[int] | None], Awaitable[None]]):
+    """
+    Invalidation bus handler applying tags committed by other workers to
+    this worker's caches. The writing worker updated its own caches in
+    the services, this mirrors that here. `refresh_suggest_entries`
+    reloads the suggest entries of the given products, all of them for
+    None.
+    """
+    async def handle(tags: set[str]):
+        logger.debug(f'Remote invalidation: {len(tags)} tags')
+
+        if ALL in tags:
+            read_cache.clear()
+            category_snapshot.mark_dirty()
+            invalidate_product_listing()
+            await refresh_suggest_entries(None)
+            return
+
+        read_cache.invalidate(tags)
+        categories_changed = any(tag == 'categories' or tag.startswith('category:') for tag in tags)
+        if categories_changed:
+            category_snapshot.mark_dirty()
+
+        product_ids = {int(tag.removeprefix('product:')) for tag in tags if tag.startswith('product:')}
+        if 'products' in tags:
+            invalidate_product_listing()
+            await refresh_suggest_entries(None)
+        elif product_ids:
+            if 'product_search' in tags:
+                invalidate_product_listing()
+            else:
+                for product_id in product_ids:
+                    invalidate_product_listing(product_id)
+            await refresh_suggest_entries(None if categories_changed else product_ids)
+        elif categories_changed:
+            # Suggestions only cover products of active categories
+            await refresh_suggest_entries(None)
+
+    return handle
@@ -0,0 +1,189 @@
+import asyncio
+import json
+import uuid
+from typing import Awaitable, Callable, Iterable
+
+import asyncpg
+
+from app import metrics
+from app.logger import logger
+
+
+# pg_notify payloads are limited to 8000 bytes.
+MAX_PAYLOAD = 7900
+
+# Tag delivered to handlers after a reconnect: notifications sent while
+# the listener was away are lost, so everything has to be dropped.
+ALL = '*'
+
+
+def encode_payloads(origin: str, tags: Iterable[str]) -> list[str]:
+    """
+    Splits `tags` into as few JSON payloads as fit into a notification.
+    """
+    payloads, chunk, size = [], [], 0
+    for tag in sorted(tags):
+        cost = len(tag.encode()) + 4
+        if chunk and size + cost > MAX_PAYLOAD - len(origin) - 20:
+            payloads.append(json.dumps({'o': origin, 't': chunk}))
+            chunk, size = [], 0
+        chunk.append(tag)
+        size += cost
+    if chunk:
+        payloads.append(json.dumps({'o': origin, 't': chunk}))
+    return payloads
+
+
+class InvalidationBus:
+    """
+    Cross-process cache invalidation over Postgres LISTEN/NOTIFY.
+
+    Writers publish the tags of a transaction with pg_notify in that same
+    transaction, so other processes hear about a change only once it is
+    committed. Every process keeps one dedicated asyncpg connection
+    LISTENing on `channel`; notifications are collected for `batch_delay`
+    seconds and handed to the subscribed handlers as one set of tags, so a
+    burst of writes costs one pass over the caches. Notifications from
+    this process are skipped, its caches were updated on commit already.
+
+    The listener reconnects with backoff after losing its connection and
+    then delivers ALL, since notifications sent in between are gone.
+    """
+
+    def __init__(
+            self,
+            dsn: str,
+            channel: str,
+            batch_delay: float = 0.05,
+            ping_interval: float = 30,
+            max_backoff: float = 30
+    ):
+        self.dsn = dsn
+        self.channel = channel
+        self.batch_delay = batch_delay
+        self.ping_interval = ping_interval
+        self.max_backoff = max_backoff
+        self.origin = uuid.uuid4().hex
+        self.received = 0
+        self.batches = 0
+        self.reconnects = 0
+        self._handlers: list[Callable[[set[str]], Awaitable[None] | None]] = []
+        self._pending: set[str] = set()
+        self._flush_task: asyncio.Task | None = None
+        self._task: asyncio.Task | None = None
+        self._connected = False
+
+    def subscribe(self, handler: Callable[[set[str]], Awaitable[None] | None]):
+        self._handlers.append(handler)
+
+    def payloads(self, tags: Iterable[str]) -> list[str]:
+        return encode_payloads(self.origin, tags)
+
+    async def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        for task in (self._task, self._flush_task):
+            if task is not None:
+                task.cancel()
+        for task in (self._task, self._flush_task):
+            if task is not None:
+                try:
+                    await task
+                except asyncio.CancelledError:
+                    pass
+        self._task = self._flush_task = None
+
+    async def _run(self):
+        backoff = 0.5
+        first = True
+        while True:
+            conn = None
+            try:
+                conn = await asyncpg.connect(self.dsn)
+                lost = asyncio.Event()
+                conn.add_termination_listener(lambda _: lost.set())
+                await conn.add_listener(self.channel, self._on_notify)
+                self._connected = True
+                logger.info(f'Invalidation bus listening on "{self.channel}"')
+
+                if not first:
+                    self.reconnects += 1
+                    self._enqueue([ALL])
+                first = False
+                backoff = 0.5
+
+                while not lost.is_set():
+                    try:
+                        await asyncio.wait_for(lost.wait(), timeout=self.ping_interval)
+                    except asyncio.TimeoutError:
+                        # a half-open TCP connection never reports itself
+                        await conn.execute('SELECT 1', timeout=self.ping_interval)
+                raise ConnectionError('listener connection closed')
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f'Invalidation bus connection lost: {e!r}, reconnecting in {backoff:.1f}s')
+                await asyncio.sleep(backoff)
+                backoff = min(backoff * 2, self.max_backoff)
+            finally:
+                self._connected = False
+                if conn is not None and not conn.is_closed():
+                    conn.terminate()
+
+    def _on_notify(self, conn, pid: int, channel: str, payload: str):
+        try:
+            message = json.loads(payload)
+            origin, tags = message['o'], message['t']
+        except (ValueError, KeyError, TypeError):
+            logger.warning(f'Invalidation bus: malformed payload {payload[:200]!r}')
+            return
+
+        self.received += 1
+        if origin != self.origin:
+            self._enqueue(tags)
+
+    def _enqueue(self, tags: Iterable[str]):
+        self._pending.update(tags)
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.get_running_loop().create_task(self._flush())
+
+    async def _flush(self):
+        # Tags arriving while handlers run are picked up by the next round.
+        while True:
+            await asyncio.sleep(self.batch_delay)
+            tags, self._pending = self._pending, set()
+            if not tags:
+                return
+
+            self.batches += 1
+            for handler in self._handlers:
+                try:
+                    result = handler(tags)
+                    if asyncio.iscoroutine(result):
+                        await result
+                except Exception:
+                    logger.exception(f'Invalidation bus handler {handler!r} failed')
+
+    def stats(self) -> dict:
+        return {
+            'connected': self._connected,
+            'received': self.received,
+            'batches': self.batches,
+            'reconnects': self.reconnects,
+        }
+
+
+_bus: InvalidationBus | None = None
+
+
+def get_bus() -> InvalidationBus | None:
+    return _bus
+
+
+def set_bus(bus: InvalidationBus | None):
+    global _bus
+    _bus = bus
+    if bus is not None:
+        metrics.register('invalidation_bus', bus.stats)
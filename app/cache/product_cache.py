@@ -0,0 +1,62 @@
+import hashlib
+
+from sqlalchemy.dialects.postgresql import asyncpg
+
+from app import metrics
+from app.cache.ttl_cache import TTLCache
+from app.cache.search_cache import SearchResultCache
+from app.config import (
+    PRODUCT_COUNT_CACHE_SIZE,
+    PRODUCT_COUNT_CACHE_TTL,
+    PRODUCT_SEARCH_CACHE_MAX_BYTES,
+    PRODUCT_SEARCH_CACHE_TTL,
+    PRODUCT_FACET_CACHE_SIZE
+)
+
+
+_dialect = asyncpg.dialect()
+
+product_count_cache = TTLCache(maxsize=PRODUCT_COUNT_CACHE_SIZE, ttl=PRODUCT_COUNT_CACHE_TTL)
+product_search_cache = SearchResultCache(max_bytes=PRODUCT_SEARCH_CACHE_MAX_BYTES, ttl=PRODUCT_SEARCH_CACHE_TTL)
+product_facet_cache = TTLCache(maxsize=PRODUCT_FACET_CACHE_SIZE, ttl=PRODUCT_COUNT_CACHE_TTL)
+
+metrics.register('product_count_cache', product_count_cache.stats)
+metrics.register('product_search_cache', product_search_cache.stats)
+metrics.register('product_facet_cache', product_facet_cache.stats)
+
+
+def normalize_search(search: str | None) -> str:
+    return ' '.join(search.split()) if search else ''
+
+
+def listing_fingerprint(filters: list, search: str | None) -> str:
+    """
+    Stable key of a listing query: the same set of filters gives the same
+    fingerprint regardless of the order they were added in.
+    """
+    clauses = []
+    for clause in filters:
+        compiled = clause.compile(dialect=_dialect)
+        params = sorted((name, repr(value)) for name, value in compiled.params.items())
+        clauses.append(f'{compiled.string} {params}')
+
+    clauses.sort()
+    clauses.append(f'search={normalize_search(search)}')
+    return hashlib.sha1('\n'.join(clauses).encode()).hexdigest()
+
+
+def invalidate_product_listing(product_id: int | None = None):
+    """
+    Drops cached totals and facets. With a product id only the search
+    pages holding that product go: enough for a change that can only take
+    it out of results. Without one all of them go, as needed when products
+    are created, activated, changed in what searches match on, or changed
+    in bulk. Rating changes are left to the TTL, they come with every
+    flush of the rating worker.
+    """
+    product_count_cache.clear()
+    product_facet_cache.clear()
+    if product_id is not None:
+        product_search_cache.evict_product(product_id)
+    else:
+        product_search_cache.clear()
@@ -0,0 +1,194 @@
+import asyncio
+import functools
+import sys
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Hashable, Iterable
+
+from pydantic import BaseModel
+
+from app import metrics
+from app.config import READ_CACHE_MAX_BYTES, READ_CACHE_MAX_ENTRIES, READ_CACHE_TTL
+
+
+# Rough per-entry cost of the key, the OrderedDict slot and the tag index
+# references, on top of the value itself.
+ENTRY_OVERHEAD = 300
+
+
+def estimate_size(value: Any) -> int:
+    """
+    Approximate memory taken by a cached view: the object plus its field
+    values, one level deep.
+    """
+    if isinstance(value, BaseModel):
+        fields = value.__dict__.values()
+    elif isinstance(value, (list, tuple)):
+        return sys.getsizeof(value) + sum(estimate_size(item) for item in value)
+    else:
+        fields = ()
+    return sys.getsizeof(value) + sum(sys.getsizeof(field) for field in fields)
+
+
+@dataclass(slots=True)
+class _Entry:
+    value: Any
+    tags: tuple[str, ...]
+    expires_at: float
+    size: int
+
+
+class ReadThroughCache:
+    """
+    Async read-through cache for repository reads, shared by all sessions
+    of the process.
+
+    Values must be immutable views (frozen schemas), never ORM objects: they
+    outlive the session that loaded them. Every entry carries tags such as
+    'product:42' and invalidate() drops all entries with any of the given
+    tags. Entries are evicted LRU when `max_entries` or the estimated
+    `max_bytes` is exceeded, and expire after `ttl` seconds.
+
+    Concurrent misses of one key share a single load. A load that overlaps
+    an invalidation is returned to its callers but not cached.
+    """
+
+    def __init__(self, max_bytes: int, max_entries: int, ttl: float):
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.bytes = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self._data: OrderedDict[Hashable, _Entry] = OrderedDict()
+        self._by_tag: dict[str, set[Hashable]] = {}
+        self._inflight: dict[Hashable, asyncio.Future] = {}
+        self._methods: dict[str, dict[str, int]] = {}
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def _count(self, method: str, outcome: str):
+        counters = self._methods.setdefault(method, {'hits': 0, 'misses': 0, 'coalesced': 0})
+        counters[outcome] += 1
+
+    async def get_or_load(
+            self,
+            method: str,
+            key: Hashable,
+            load: Callable[[], Awaitable[Any]],
+            tags: Callable[[Any], Iterable[str]]
+    ) -> Any:
+        """
+        Cached value of `key`, loaded with `load()` on a miss. `tags`
+        gives the tags of a loaded value. None results are not cached.
+        """
+        entry = self._data.get(key)
+        if entry is not None:
+            if entry.expires_at > time.monotonic():
+                self._data.move_to_end(key)
+                self._count(method, 'hits')
+                return entry.value
+            self._remove(key)
+
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            self._count(method, 'coalesced')
+            return await asyncio.shield(inflight)
+
+        self._count(method, 'misses')
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        invalidations = self.invalidations
+        try:
+            value = await load()
+        except BaseException as e:
+            future.set_exception(e)
+            # nobody else may be waiting, don't warn about an unretrieved exception
+            future.exception()
+            raise
+        else:
+            future.set_result(value)
+            if value is not None and invalidations == self.invalidations:
+                self._store(key, value, tuple(tags(value)))
+            return value
+        finally:
+            del self._inflight[key]
+
+    def _store(self, key: Hashable, value: Any, tags: tuple[str, ...]):
+        size = ENTRY_OVERHEAD + estimate_size(value)
+        if size > self.max_bytes:
+            return
+
+        self._remove(key)
+        self._data[key] = _Entry(value, tags, time.monotonic() + self.ttl, size)
+        self.bytes += size
+        for tag in tags:
+            self._by_tag.setdefault(tag, set()).add(key)
+
+        while self._data and (self.bytes > self.max_bytes or len(self._data) > self.max_entries):
+            self._remove(next(iter(self._data)))
+            self.evictions += 1
+
+    def _remove(self, key: Hashable):
+        entry = self._data.pop(key, None)
+        if entry is None:
+            return
+
+        self.bytes -= entry.size
+        for tag in entry.tags:
+            keys = self._by_tag.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._by_tag[tag]
+
+    def invalidate(self, tags: Iterable[str]):
+        self.invalidations += 1
+        for tag in tags:
+            for key in self._by_tag.pop(tag, ()):
+                self._remove(key)
+
+    def clear(self):
+        self.invalidations += 1
+        self._data.clear()
+        self._by_tag.clear()
+        self.bytes = 0
+
+    def stats(self) -> dict:
+        methods = {}
+        for method, counters in self._methods.items():
+            lookups = counters['hits'] + counters['misses'] + counters['coalesced']
+            methods[method] = {**counters, 'hit_ratio': round(counters['hits'] / lookups, 4) if lookups else None}
+        return {
+            'size': len(self._data),
+            'bytes': self.bytes,
+            'max_bytes': self.max_bytes,
+            'evictions': self.evictions,
+            'invalidations': self.invalidations,
+            'methods': methods,
+        }
+
+
+read_cache = ReadThroughCache(max_bytes=READ_CACHE_MAX_BYTES, max_entries=READ_CACHE_MAX_ENTRIES, ttl=READ_CACHE_TTL)
+
+metrics.register('read_cache', read_cache.stats)
+
+
+def read_through(method: str, tags: Callable[[Any], Iterable[str]]):
+    """
+    Opts a repository method into read_cache. The method's positional and
+    keyword arguments form the key, so it must be called with hashable
+    arguments and return an immutable view or None.
+
+        @read_through('product', tags=lambda view: (f'product:{view.id}',))
+        async def get_product_view(self, product_id: int): ...
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(self, *args, **kwargs):
+            key = (method, args, tuple(sorted(kwargs.items())))
+            return await read_cache.get_or_load(method, key, lambda: func(self, *args, **kwargs), tags)
+        return wrapper
+    return decorator
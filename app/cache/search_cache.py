@@ -0,0 +1,118 @@
+import sys
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Hashable
+
+
+# Rough per-entry cost of the key, the OrderedDict slot and the reverse
+# index references, on top of the id tuple itself.
+ENTRY_OVERHEAD = 400
+INT_SIZE = sys.getsizeof(2 ** 40)
+
+
+@dataclass(frozen=True, slots=True)
+class SearchPage:
+    ids: tuple[int, ...]
+    next_key: dict | None
+    expires_at: float
+    size: int
+
+
+class SearchResultCache:
+    """
+    Ranked product id lists of search listings.
+
+    Only ids are kept, the rows are hydrated by the caller, so changes to
+    a product that do not move it in or out of a result need no eviction.
+    The cache is bounded by an estimate of the memory the entries take and
+    drops entries that contain a product when that product changes.
+    Changes that can make a product match entries it isn't in have to
+    clear() the cache.
+    """
+
+    def __init__(self, max_bytes: int, ttl: float):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.bytes = 0
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self._data: OrderedDict[Hashable, SearchPage] = OrderedDict()
+        self._by_product: dict[int, set[Hashable]] = {}
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, key: Hashable) -> SearchPage | None:
+        entry = self._data.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+
+        if entry.expires_at <= time.monotonic():
+            self._remove(key)
+            self.misses += 1
+            return None
+
+        self._data.move_to_end(key)
+        self.hits += 1
+        return entry
+
+    def set(self, key: Hashable, ids: tuple[int, ...], next_key: dict | None, generation: int | None = None):
+        if generation is not None and generation != self.generation:
+            return
+
+        size = ENTRY_OVERHEAD + sys.getsizeof(ids) + INT_SIZE * len(ids)
+        if size > self.max_bytes:
+            return
+
+        if key in self._data:
+            self._remove(key)
+
+        self._data[key] = SearchPage(ids=ids, next_key=next_key,
+                                     expires_at=time.monotonic() + self.ttl, size=size)
+        self.bytes += size
+        for product_id in ids:
+            self._by_product.setdefault(product_id, set()).add(key)
+
+        while self.bytes > self.max_bytes:
+            oldest = next(iter(self._data))
+            self._remove(oldest)
+            self.evictions += 1
+
+    def evict_product(self, product_id: int):
+        self.generation += 1
+        for key in self._by_product.pop(product_id, ()):
+            if key in self._data:
+                self._remove(key)
+                self.invalidations += 1
+
+    def clear(self):
+        self._data.clear()
+        self._by_product.clear()
+        self.bytes = 0
+        self.generation += 1
+
+    def _remove(self, key: Hashable):
+        entry = self._data.pop(key)
+        self.bytes -= entry.size
+        for product_id in entry.ids:
+            keys = self._by_product.get(product_id)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._by_product[product_id]
+
+    def stats(self) -> dict:
+        return {
+            'size': len(self._data),
+            'bytes': self.bytes,
+            'max_bytes': self.max_bytes,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'invalidations': self.invalidations,
+        }
@@ -0,0 +1,179 @@
+import heapq
+from bisect import bisect_left
+
+from app import metrics
+
+
+MAX_TOKEN_LEN = 24
+MAX_TOKENS = 4
+
+
+def normalize_name(name: str) -> str:
+    return ' '.join(name.casefold().split())
+
+
+def name_tokens(name: str) -> set[str]:
+    """
+    Strings a product can be found by: the normalized name starting at each
+    of its first MAX_TOKENS words, so "red ph" and "ph" both match
+    "Red Phone".
+    """
+    normalized = normalize_name(name)
+    tokens = set()
+    start = 0
+    for _ in range(MAX_TOKENS):
+        tokens.add(normalized[start:start + MAX_TOKEN_LEN])
+        start = normalized.find(' ', start) + 1
+        if start == 0:
+            break
+    tokens.discard('')
+    return tokens
+
+
+class SuggestIndex:
+    """
+    In-memory prefix index of product names for type-ahead.
+
+    Tokens are kept in a sorted list and a prefix is resolved with two
+    bisects. Short prefixes match too many tokens to rank on every
+    keystroke, so for prefixes matching more than `heavy` tokens the best
+    `memo_depth` products are memoized and kept up to date by add/remove.
+    """
+
+    def __init__(self, limit: int = 10, heavy: int = 256):
+        self.limit = limit
+        self.heavy = heavy
+        self.memo_depth = limit * 4
+        self.ready = False
+        self._tokens: list[str] = []
+        self._ids: list[int] = []
+        self._products: dict[int, tuple[str, float]] = {}
+        self._memo: dict[str, list[tuple[float, int]]] = {}
+
+    def __len__(self) -> int:
+        return len(self._products)
+
+    def rebuild(self, products):
+        """
+        Replaces the whole index with `products`, an iterable of
+        (id, name, rating).
+        """
+        self._products = {product_id: (name, rating) for product_id, name, rating in products}
+        pairs = sorted(
+            (token, product_id)
+            for product_id, (name, _) in self._products.items()
+            for token in name_tokens(name)
+        )
+        self._tokens = [token for token, _ in pairs]
+        self._ids = [product_id for _, product_id in pairs]
+        self._memo = {}
+
+        for prefix in {token[:length] for token in self._tokens for length in (1, 2, 3)}:
+            lo, hi = self._range(prefix)
+            if hi - lo > self.heavy:
+                self._memo[prefix] = self._best(lo, hi, self.memo_depth)
+        self.ready = True
+
+    def refresh(self, products, product_ids: set[int] | None):
+        """
+        Applies fresh (id, name, rating) entries of `product_ids`: the ones
+        given are added or updated, the other ids removed. None for
+        `product_ids` rebuilds the whole index from `products`.
+        """
+        if product_ids is None:
+            self.rebuild(products)
+            return
+
+        found = set()
+        for product_id, name, rating in products:
+            self.add(product_id, name, rating)
+            found.add(product_id)
+        for product_id in product_ids - found:
+            self.remove(product_id)
+
+    def add(self, product_id: int, name: str, rating: float):
+        if product_id in self._products:
+            self.remove(product_id)
+
+        self._products[product_id] = (name, rating)
+        entry = (-rating, product_id)
+        for token in name_tokens(name):
+            position = bisect_left(self._tokens, token)
+            self._tokens.insert(position, token)
+            self._ids.insert(position, product_id)
+
+            for length in range(1, len(token) + 1):
+                best = self._memo.get(token[:length])
+                if best is None or entry in best:
+                    continue
+                position = bisect_left(best, entry)
+                if position < self.memo_depth:
+                    best.insert(position, entry)
+                    del best[self.memo_depth:]
+
+    def remove(self, product_id: int):
+        product = self._products.pop(product_id, None)
+        if product is None:
+            return
+
+        name, rating = product
+        entry = (-rating, product_id)
+        tokens = name_tokens(name)
+        for token in tokens:
+            position = bisect_left(self._tokens, token)
+            while self._ids[position] != product_id:
+                position += 1
+            del self._tokens[position]
+            del self._ids[position]
+
+        for prefix in {token[:length] for token in tokens for length in range(1, len(token) + 1)}:
+            best = self._memo.get(prefix)
+            if best is None or entry not in best:
+                continue
+            best.remove(entry)
+            if len(best) < self.limit:
+                lo, hi = self._range(prefix)
+                if hi - lo > self.heavy:
+                    self._memo[prefix] = self._best(lo, hi, self.memo_depth)
+                else:
+                    del self._memo[prefix]
+
+    def suggest(self, query: str, limit: int | None = None) -> list[dict]:
+        limit = min(limit or self.limit, self.limit)
+        prefix = normalize_name(query)[:MAX_TOKEN_LEN]
+        if not prefix:
+            return []
+
+        best = self._memo.get(prefix)
+        if best is None:
+            lo, hi = self._range(prefix)
+            if hi - lo > self.heavy:
+                best = self._memo[prefix] = self._best(lo, hi, self.memo_depth)
+            else:
+                best = self._best(lo, hi, limit)
+
+        return [
+            {'id': product_id, 'name': self._products[product_id][0], 'rating': -rating}
+            for rating, product_id in best[:limit]
+        ]
+
+    def _range(self, prefix: str) -> tuple[int, int]:
+        lo = bisect_left(self._tokens, prefix)
+        hi = bisect_left(self._tokens, prefix + '\U0010ffff', lo)
+        return lo, hi
+
+    def _best(self, lo: int, hi: int, count: int) -> list[tuple[float, int]]:
+        entries = {(-self._products[product_id][1], product_id) for product_id in self._ids[lo:hi]}
+        return heapq.nsmallest(count, entries)
+
+    def stats(self) -> dict:
+        return {
+            'products': len(self._products),
+            'tokens': len(self._tokens),
+            'memoized_prefixes': len(self._memo),
+        }
+
+
+product_suggest_index = SuggestIndex()
+
+metrics.register('product_suggest_index', product_suggest_index.stats)
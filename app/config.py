@@ -3,3 +3,42 @@ import os
 SECRET_KEY = os.getenv('SECRET_KEY')
 ALGORITHM = 'HS256'
 
+
+PRODUCT_COUNT_CACHE_SIZE = int(os.getenv('PRODUCT_COUNT_CACHE_SIZE', 10_000))
+PRODUCT_COUNT_CACHE_TTL = float(os.getenv('PRODUCT_COUNT_CACHE_TTL', 60))
+
+PRODUCT_SEARCH_CACHE_MAX_BYTES = int(os.getenv('PRODUCT_SEARCH_CACHE_MAX_BYTES', 32 * 1024 * 1024))
+PRODUCT_SEARCH_CACHE_TTL = float(os.getenv('PRODUCT_SEARCH_CACHE_TTL', 30))
+
+PRODUCT_FACET_CACHE_SIZE = int(os.getenv('PRODUCT_FACET_CACHE_SIZE', 5_000))
+
+PRODUCT_IMPORT_MAX_ROWS = int(os.getenv('PRODUCT_IMPORT_MAX_ROWS', 100_000))
+PRODUCT_BULK_UPDATE_MAX_ITEMS = int(os.getenv('PRODUCT_BULK_UPDATE_MAX_ITEMS', 10_000))
+
+CATEGORY_SNAPSHOT_CHECK_INTERVAL = float(os.getenv('CATEGORY_SNAPSHOT_CHECK_INTERVAL', 5))
+
+READ_CACHE_MAX_BYTES = int(os.getenv('READ_CACHE_MAX_BYTES', 64 * 1024 * 1024))
+READ_CACHE_MAX_ENTRIES = int(os.getenv('READ_CACHE_MAX_ENTRIES', 100_000))
+READ_CACHE_TTL = float(os.getenv('READ_CACHE_TTL', 300))
+
+CACHE_BUS_ENABLED = os.getenv('CACHE_BUS_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+CACHE_BUS_CHANNEL = os.getenv('CACHE_BUS_CHANNEL', 'cache_invalidation')
+CACHE_BUS_BATCH_DELAY = float(os.getenv('CACHE_BUS_BATCH_DELAY', 0.05))
+
+PASSWORD_HASH_WORKERS = int(os.getenv('PASSWORD_HASH_WORKERS', os.cpu_count() or 1))
+PASSWORD_HASH_QUEUE_TIMEOUT = float(os.getenv('PASSWORD_HASH_QUEUE_TIMEOUT', 2))
+
+# Fixed bcrypt cost. When unset the cost is calibrated at startup to the
+# highest one hashing within BCRYPT_TARGET_MS, but at least BCRYPT_MIN_ROUNDS.
+BCRYPT_ROUNDS = int(os.getenv('BCRYPT_ROUNDS')) if os.getenv('BCRYPT_ROUNDS') else None
+BCRYPT_TARGET_MS = float(os.getenv('BCRYPT_TARGET_MS', 250))
+BCRYPT_MIN_ROUNDS = int(os.getenv('BCRYPT_MIN_ROUNDS', 10))
+
+JWT_CACHE_SIZE = int(os.getenv('JWT_CACHE_SIZE', 10_000))
+JWT_CACHE_SKEW = float(os.getenv('JWT_CACHE_SKEW', 5))
+
+RATING_FLUSH_INTERVAL = float(os.getenv('RATING_FLUSH_INTERVAL', 1))
+# rating deltas applied per transaction
+RATING_FLUSH_BATCH = int(os.getenv('RATING_FLUSH_BATCH', 5000))
+
+CART_BATCH_MAX_OPERATIONS = int(os.getenv('CART_BATCH_MAX_OPERATIONS', 200))
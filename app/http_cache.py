@@ -0,0 +1,73 @@
+import hashlib
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+
+from fastapi import Request, Response, status
+
+
+def entity_etag(*parts) -> str:
+    """
+    Strong ETag of a single row, e.g. entity_etag('product', id, version).
+    """
+    return '"' + '-'.join(map(str, parts)) + '"'
+
+
+def collection_etag(items, *extra) -> str:
+    """
+    Strong ETag of a list of versioned rows plus anything else that ends
+    up in the response body (totals, cursors, facets).
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    for item in items:
+        digest.update(f'{item.id}:{item.version},'.encode())
+    digest.update(repr(extra).encode())
+    return f'"{digest.hexdigest()}"'
+
+
+def last_modified_of(items) -> datetime | None:
+    return max((item.updated_at for item in items), default=None)
+
+
+def _etag_matches(header: str, etag: str) -> bool:
+    # If-None-Match uses the weak comparison, W/ prefixes are ignored.
+    tags = [tag.strip().removeprefix('W/') for tag in header.split(',')]
+    return '*' in tags or etag in tags
+
+
+def _not_modified_since(header: str, last_modified: datetime) -> bool:
+    try:
+        since = parsedate_to_datetime(header)
+    except (TypeError, ValueError):
+        return False
+    if since.tzinfo is None:
+        since = since.replace(tzinfo=timezone.utc)
+    return last_modified.replace(microsecond=0) <= since
+
+
+def conditional(
+        request: Request,
+        response: Response,
+        etag: str,
+        last_modified: datetime | None = None
+) -> Response | None:
+    """
+    Sets ETag/Last-Modified on `response` and returns a bodiless 304 when
+    the request's validators still match, None when the body has to be
+    sent. If-Modified-Since is only looked at without If-None-Match.
+    """
+    headers = {'ETag': etag, 'Cache-Control': 'no-cache'}
+    if last_modified is not None:
+        headers['Last-Modified'] = format_datetime(last_modified.astimezone(timezone.utc), usegmt=True)
+    response.headers.update(headers)
+
+    if_none_match = request.headers.get('if-none-match')
+    if if_none_match is not None:
+        matched = _etag_matches(if_none_match, etag)
+    else:
+        if_modified_since = request.headers.get('if-modified-since')
+        matched = (if_modified_since is not None and last_modified is not None
+                   and _not_modified_since(if_modified_since, last_modified))
+
+    if matched:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return None
@@ -0,0 +1,71 @@
+import csv
+import io
+import json
+from typing import BinaryIO, Iterator
+
+
+def detect_import_format(filename: str | None, content_type: str | None, requested: str | None = None) -> str | None:
+    """
+    'csv' or 'ndjson' from an explicit ?format=, the upload's content type
+    or its file extension, None when none of them tells.
+    """
+    if requested:
+        return requested
+
+    content_type = content_type or ''
+    filename = (filename or '').lower()
+    if 'ndjson' in content_type or 'jsonl' in content_type or filename.endswith(('.ndjson', '.jsonl')):
+        return 'ndjson'
+    if 'csv' in content_type or filename.endswith('.csv'):
+        return 'csv'
+    return None
+
+
+def read_rows(file: BinaryIO, import_format: str) -> Iterator[tuple[int, dict | None, str | None]]:
+    """
+    Yields (row number, fields, error) for every non-empty record of an
+    uploaded file, numbered from 1. Records that can not be parsed come
+    with fields None and the reason in error, so the caller can report
+    them next to validation errors. Empty CSV cells are read as None.
+    A CSV header that can not be parsed raises csv.Error.
+    """
+    text = io.TextIOWrapper(file, encoding='utf-8-sig', newline='')
+    try:
+        if import_format == 'csv':
+            reader = csv.DictReader(text)
+            if reader.fieldnames is None:
+                return
+            row_no = 0
+            while True:
+                row_no += 1
+                try:
+                    row = next(reader)
+                except StopIteration:
+                    return
+                except csv.Error as e:
+                    # e.g. a cell over csv.field_size_limit(), the reader
+                    # carries on with the next line
+                    yield row_no, None, f'Malformed CSV row: {e}'
+                    continue
+                if None in row:
+                    yield row_no, None, 'Row has more cells than the header'
+                else:
+                    yield row_no, {key: value if value != '' else None for key, value in row.items()}, None
+
+        row_no = 0
+        for line in text:
+            if not line.strip():
+                continue
+            row_no += 1
+            try:
+                fields = json.loads(line)
+            except ValueError:
+                yield row_no, None, 'Invalid JSON'
+                continue
+            if isinstance(fields, dict):
+                yield row_no, fields, None
+            else:
+                yield row_no, None, 'Expected a JSON object'
+    finally:
+        # leave the upload itself open, it belongs to the caller
+        text.detach()
@@ -0,0 +1,38 @@
+"""
+Checks products' rating_sum / rating_count and product_rating_stats
+against their active reviews and fixes the ones that drifted. Safe to run
+next to the app, e.g. nightly:
+
+    python -m app.jobs.reconcile_ratings --batch-size 10000
+    python -m app.jobs.reconcile_ratings --dry-run
+"""
+import argparse
+import asyncio
+
+from sqlalchemy import make_url
+
+from app.config import CACHE_BUS_ENABLED, CACHE_BUS_CHANNEL
+from app.database import SQL_ALCHEMY_DATABASE_URL, async_session_maker
+from app.cache.notify_bus import InvalidationBus, set_bus
+from app.services.review_service import ReviewService
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--batch-size', type=int, default=10_000, help='products per transaction')
+    parser.add_argument('--dry-run', action='store_true', help='only report the drift')
+    args = parser.parse_args()
+
+    if CACHE_BUS_ENABLED:
+        # Not started: only publishes the fixed products' tags, so that the
+        # app's workers drop what they cached.
+        dsn = make_url(SQL_ALCHEMY_DATABASE_URL).set(drivername='postgresql').render_as_string(hide_password=False)
+        set_bus(InvalidationBus(dsn, CACHE_BUS_CHANNEL))
+
+    async with async_session_maker() as session:
+        report = await ReviewService(session).reconcile_ratings(batch_size=args.batch_size, fix=not args.dry_run)
+    print(report)
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
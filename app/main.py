@@ -8,13 +8,58 @@ from fastapi.middleware.gzip import GZipMiddleware
 
 from app.models import users_model
 from app.logger import logger
+from app.database import async_session_maker, SQL_ALCHEMY_DATABASE_URL
+from app.config import CACHE_BUS_ENABLED, CACHE_BUS_CHANNEL, CACHE_BUS_BATCH_DELAY
+from app.config import BCRYPT_ROUNDS, BCRYPT_TARGET_MS, BCRYPT_MIN_ROUNDS
+from app.auth.security import calibrate_bcrypt_rounds, configure_bcrypt
+from fastapi.concurrency import run_in_threadpool
+from app.cache.notify_bus import InvalidationBus, set_bus
+from app.cache.invalidation import remote_invalidation_handler
+from sqlalchemy import make_url
+from app.services.product_service import ProductService
+from app.rating_worker import rating_worker
+from contextlib import asynccontextmanager
 import time
 
 
-from app.routers import users, categories, products, reviews, cart_items, orders
+from app.routers import users, categories, products, reviews, cart_items, orders, metrics
 
 
-app = FastAPI(title="FastAPI ecommerce")
+async def refresh_suggest_entries(product_ids: set[int] | None):
+    async with async_session_maker() as session:
+        await ProductService(session).refresh_suggest_entries(product_ids)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Workers calibrating side by side slow each other down and may settle
+    # on different costs, set BCRYPT_ROUNDS to pin one.
+    rounds = BCRYPT_ROUNDS or await run_in_threadpool(calibrate_bcrypt_rounds, BCRYPT_TARGET_MS, BCRYPT_MIN_ROUNDS)
+    configure_bcrypt(rounds)
+
+    async with async_session_maker() as session:
+        await ProductService(session).rebuild_suggest_index()
+
+    bus = None
+    if CACHE_BUS_ENABLED:
+        dsn = make_url(SQL_ALCHEMY_DATABASE_URL).set(drivername='postgresql').render_as_string(hide_password=False)
+        bus = InvalidationBus(dsn, CACHE_BUS_CHANNEL, batch_delay=CACHE_BUS_BATCH_DELAY)
+        bus.subscribe(remote_invalidation_handler(refresh_suggest_entries))
+        set_bus(bus)
+        await bus.start()
+
+    await rating_worker.start()
+
+    yield
+
+    # flushes pending ratings, still publishing on the bus
+    await rating_worker.stop()
+    if bus is not None:
+        await bus.stop()
+        set_bus(None)
+
+
+app = FastAPI(title="FastAPI ecommerce", lifespan=lifespan)
 
 
 origins = ["http://localhost:3000", "http://example.com"]
@@ -58,6 +103,7 @@ app.include_router(products.router)
 app.include_router(reviews.router)
 app.include_router(cart_items.router)
 app.include_router(orders.router)
+app.include_router(metrics.router)
 
 
 @app.get("/")
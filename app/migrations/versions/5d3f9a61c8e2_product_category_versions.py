@@ -0,0 +1,38 @@
+"""product and category versions
+
+Revision ID: 5d3f9a61c8e2
+Revises: c4e81f07d2b9
+Create Date: 2026-10-18 12:20:43.118406
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5d3f9a61c8e2'
+down_revision: Union[str, Sequence[str], None] = 'c4e81f07d2b9'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+TABLES = ('products', 'categories')
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Constant and now() defaults are stored in the catalog, existing rows
+    # are not rewritten.
+    for table in TABLES:
+        op.add_column(table, sa.Column('version', sa.Integer(), server_default=sa.text('1'), nullable=False))
+        op.add_column(table, sa.Column('updated_at', sa.DateTime(timezone=True),
+                                       server_default=sa.text('now()'), nullable=False))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for table in TABLES:
+        op.drop_column(table, 'updated_at')
+        op.drop_column(table, 'version')
@@ -0,0 +1,60 @@
+"""product rating aggregates
+
+Revision ID: 7a41d3c9e5b8
+Revises: e2b7c90d14a6
+Create Date: 2026-10-18 16:40:27.804113
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7a41d3c9e5b8'
+down_revision: Union[str, Sequence[str], None] = 'e2b7c90d14a6'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# Kept here rather than imported from the model, a migration must not change
+# when the model does.
+RATING_EXPRESSION = (
+    'CASE WHEN rating_count > 0 '
+    'THEN round(rating_sum::numeric / rating_count, 2)::double precision '
+    'ELSE 0 END'
+)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('products', sa.Column('rating_sum', sa.Integer(), server_default=sa.text('0'), nullable=False))
+    op.add_column('products', sa.Column('rating_count', sa.Integer(), server_default=sa.text('0'), nullable=False))
+    op.execute("""
+        UPDATE products p
+        SET rating_sum = r.rating_sum, rating_count = r.rating_count
+        FROM (
+            SELECT product_id, sum(grade) AS rating_sum, count(*) AS rating_count
+            FROM reviews
+            WHERE is_active IS TRUE
+            GROUP BY product_id
+        ) r
+        WHERE p.id = r.product_id
+    """)
+
+    # A column cannot be turned into a generated one: rating is dropped,
+    # with ix_products_active_rating, and added back.
+    op.drop_column('products', 'rating')
+    op.add_column('products', sa.Column('rating', sa.Float(), sa.Computed(RATING_EXPRESSION, persisted=True),
+                                        nullable=False))
+    op.create_index('ix_products_active_rating', 'products', ['rating'], unique=False,
+                    postgresql_where=sa.text('is_active IS TRUE'))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    # rating keeps its values and its index as a plain column
+    op.execute('ALTER TABLE products ALTER COLUMN rating DROP EXPRESSION')
+    op.drop_column('products', 'rating_count')
+    op.drop_column('products', 'rating_sum')
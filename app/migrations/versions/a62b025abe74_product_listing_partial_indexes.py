@@ -0,0 +1,53 @@
+"""product listing partial indexes
+
+Revision ID: a62b025abe74
+Revises: a7bada02897f
+Create Date: 2026-10-18 10:12:41.307215
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a62b025abe74'
+down_revision: Union[str, Sequence[str], None] = 'a7bada02897f'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# /products always filters on is_active IS true and orders by id (or by
+# rank when searching, which is served by ix_products_tsv_gin). The
+# predicate is spelled exactly like the listing filter so the planner can
+# match it.
+ACTIVE = 'is_active IS TRUE'
+
+INDEXES = [
+    ('ix_products_active_id', ['id'], ACTIVE),
+    ('ix_products_active_category_id', ['category_id', 'id'], ACTIVE),
+    ('ix_products_active_seller_id', ['seller_id', 'id'], ACTIVE),
+    ('ix_products_active_price', ['price'], ACTIVE),
+    ('ix_products_active_rating', ['rating'], ACTIVE),
+    ('ix_products_active_in_stock_id', ['id'], f'{ACTIVE} AND stock > 0'),
+]
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    with op.get_context().autocommit_block():
+        for name, columns, where in INDEXES:
+            op.create_index(name, 'products', columns, unique=False,
+                            postgresql_where=sa.text(where),
+                            postgresql_concurrently=True,
+                            if_not_exists=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        for name, _, _ in reversed(INDEXES):
+            op.drop_index(name, table_name='products',
+                          postgresql_concurrently=True,
+                          if_exists=True)
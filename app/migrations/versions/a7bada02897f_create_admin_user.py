@@ -11,10 +11,13 @@ from alembic import op
 import sqlalchemy as sa
 from passlib.context import CryptContext
 
-pwd_context = CryptContext(schemes=['bcrypt'], deprecated='auto')
-
 import os
 
+# BCRYPT_ROUNDS as in the app, otherwise passlib's default; a lower cost is
+# raised on the admin's first login.
+pwd_context = CryptContext(schemes=['bcrypt'], deprecated='auto',
+                           bcrypt__default_rounds=int(os.getenv('BCRYPT_ROUNDS') or 12))
+
 # revision identifiers, used by Alembic.
 revision: str = 'a7bada02897f'
 down_revision: Union[str, Sequence[str], None] = '0ecf698de475'
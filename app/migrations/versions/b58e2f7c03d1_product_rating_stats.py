@@ -0,0 +1,46 @@
+"""product rating stats
+
+Revision ID: b58e2f7c03d1
+Revises: 7a41d3c9e5b8
+Create Date: 2026-10-18 18:05:52.417730
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b58e2f7c03d1'
+down_revision: Union[str, Sequence[str], None] = '7a41d3c9e5b8'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+GRADES = (1, 2, 3, 4, 5)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('product_rating_stats',
+    sa.Column('product_id', sa.Integer(), nullable=False),
+    *(sa.Column(f'grade_{grade}', sa.Integer(), server_default=sa.text('0'), nullable=False) for grade in GRADES),
+    sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+    sa.ForeignKeyConstraint(['product_id'], ['products.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('product_id')
+    )
+    columns = ', '.join(f'grade_{grade}' for grade in GRADES)
+    counts = ', '.join(f'count(*) FILTER (WHERE grade = {grade})' for grade in GRADES)
+    op.execute(f"""
+        INSERT INTO product_rating_stats (product_id, {columns})
+        SELECT product_id, {counts}
+        FROM reviews
+        WHERE is_active IS TRUE
+        GROUP BY product_id
+    """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('product_rating_stats')
@@ -0,0 +1,36 @@
+"""reviews product date index
+
+Revision ID: c4e81f07d2b9
+Revises: a62b025abe74
+Create Date: 2026-10-18 11:02:17.554830
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c4e81f07d2b9'
+down_revision: Union[str, Sequence[str], None] = 'a62b025abe74'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Serves /reviews/products/{id}: equality on product_id and is_active,
+    # then a backward scan of (comment_date, id) for the keyset pages.
+    with op.get_context().autocommit_block():
+        op.create_index('ix_reviews_product_active_date', 'reviews',
+                        ['product_id', 'is_active', 'comment_date', 'id'], unique=False,
+                        postgresql_concurrently=True,
+                        if_not_exists=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_reviews_product_active_date', table_name='reviews',
+                      postgresql_concurrently=True,
+                      if_exists=True)
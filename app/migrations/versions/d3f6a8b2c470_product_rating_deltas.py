@@ -0,0 +1,37 @@
+"""product rating deltas
+
+Revision ID: d3f6a8b2c470
+Revises: b58e2f7c03d1
+Create Date: 2026-10-18 20:12:37.905114
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd3f6a8b2c470'
+down_revision: Union[str, Sequence[str], None] = 'b58e2f7c03d1'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Drained within seconds by the rating worker, so no index beyond the
+    # primary key it is drained in order of.
+    op.create_table('product_rating_deltas',
+    sa.Column('id', sa.BigInteger(), nullable=False),
+    sa.Column('product_id', sa.Integer(), nullable=False),
+    sa.Column('grade', sa.SmallInteger(), nullable=False),
+    sa.Column('delta', sa.SmallInteger(), nullable=False),
+    sa.ForeignKeyConstraint(['product_id'], ['products.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id')
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('product_rating_deltas')
@@ -0,0 +1,28 @@
+"""user token version
+
+Revision ID: e2b7c90d14a6
+Revises: 5d3f9a61c8e2
+Create Date: 2026-10-18 15:02:11.530214
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e2b7c90d14a6'
+down_revision: Union[str, Sequence[str], None] = '5d3f9a61c8e2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('users', sa.Column('token_version', sa.Integer(), server_default=sa.text('1'), nullable=False))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('users', 'token_version')
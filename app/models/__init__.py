@@ -4,6 +4,8 @@ from .products_model import Product
 from .reviews_model import Review
 from .cart_items_model import CartItem
 from .orders_model import Order, OrderItem
+from .product_rating_stats_model import ProductRatingStats
+from .product_rating_deltas_model import ProductRatingDelta
 
 __all__ = [
     'User', 
@@ -12,5 +14,7 @@ __all__ = [
     'Review', 
     'CartItem', 
     'Order', 
-    'OrderItem'
+    'OrderItem',
+    'ProductRatingStats',
+    'ProductRatingDelta'
 ]
@@ -1,4 +1,6 @@
-from sqlalchemy import String, Boolean
+from datetime import datetime
+
+from sqlalchemy import String, Boolean, Integer, DateTime, func, text, literal_column
 from sqlalchemy.orm import Mapped, mapped_column as mc, relationship
 from app.database import Base
 
@@ -9,6 +11,20 @@ class Category(Base):
     id: Mapped[int] = mc(primary_key=True, index=True)
     name: Mapped[str] = mc(String(50), unique=True)
     is_active: Mapped[bool] = mc(Boolean, default=True)
+    version: Mapped[int] = mc(
+        Integer,
+        server_default=text('1'),
+        onupdate=literal_column('version + 1'),
+        nullable=False
+    )
+    updated_at: Mapped[datetime] = mc(
+        DateTime(timezone=True),
+        server_default=func.now(),
+        onupdate=func.now(),
+        nullable=False
+    )
+
+    __mapper_args__ = {'eager_defaults': True}
 
     products = relationship(
         'Product',
@@ -0,0 +1,24 @@
+from sqlalchemy.orm import Mapped, mapped_column as mc
+from sqlalchemy import ForeignKey, BigInteger, Integer, SmallInteger
+
+from app.database import Base
+
+
+class ProductRatingDelta(Base):
+    """
+    A grade entering (delta 1) or leaving (delta -1) a product's active
+    reviews, written in the transaction of the review change. The rating
+    worker adds the pending rows up per product into rating_sum,
+    rating_count and product_rating_stats, and deletes them.
+    """
+
+    __tablename__ = "product_rating_deltas"
+
+    id: Mapped[int] = mc(BigInteger, primary_key=True)
+    product_id: Mapped[int] = mc(
+        Integer,
+        ForeignKey("products.id", ondelete="CASCADE"),
+        nullable=False
+    )
+    grade: Mapped[int] = mc(SmallInteger, nullable=False)
+    delta: Mapped[int] = mc(SmallInteger, nullable=False)
@@ -0,0 +1,35 @@
+from datetime import datetime
+
+from sqlalchemy.orm import Mapped, mapped_column as mc
+from sqlalchemy import ForeignKey, DateTime, Integer, func, text
+
+from app.database import Base
+
+
+GRADES = (1, 2, 3, 4, 5)
+
+
+class ProductRatingStats(Base):
+    """
+    Number of active reviews per grade of a product, kept by the rating
+    worker together with the product's rating_sum and rating_count.
+    """
+
+    __tablename__ = "product_rating_stats"
+
+    product_id: Mapped[int] = mc(
+        Integer,
+        ForeignKey("products.id", ondelete="CASCADE"),
+        primary_key=True
+    )
+    grade_1: Mapped[int] = mc(Integer, server_default=text('0'), nullable=False)
+    grade_2: Mapped[int] = mc(Integer, server_default=text('0'), nullable=False)
+    grade_3: Mapped[int] = mc(Integer, server_default=text('0'), nullable=False)
+    grade_4: Mapped[int] = mc(Integer, server_default=text('0'), nullable=False)
+    grade_5: Mapped[int] = mc(Integer, server_default=text('0'), nullable=False)
+    updated_at: Mapped[datetime] = mc(
+        DateTime(timezone=True),
+        server_default=func.now(),
+        onupdate=func.now(),
+        nullable=False
+    )
@@ -1,3 +1,4 @@
+from datetime import datetime
 from decimal import Decimal
 from sqlalchemy import (
     ForeignKey, 
@@ -7,13 +8,24 @@ from sqlalchemy import (
     Integer, 
     Numeric,
     Computed,
-    Index
+    Index,
+    DateTime,
+    func,
+    text,
+    literal_column
 )
 from sqlalchemy.dialects.postgresql import TSVECTOR
 from sqlalchemy.orm import Mapped, mapped_column as mc, relationship
 from app.database import Base
 
 
+RATING_EXPRESSION = (
+    'CASE WHEN rating_count > 0 '
+    'THEN round(rating_sum::numeric / rating_count, 2)::double precision '
+    'ELSE 0 END'
+)
+
+
 class Product(Base):
     __tablename__ = 'products'
 
@@ -25,8 +37,30 @@ class Product(Base):
     stock: Mapped[int] = mc(Integer, nullable=False)
     category_id: Mapped[int] = mc(Integer, ForeignKey('categories.id', ondelete='SET NULL'), nullable=False)
     seller_id: Mapped[int] = mc(Integer, ForeignKey('users.id', ondelete='CASCADE'), nullable=False)
-    rating: Mapped[float] = mc(Float, default=0.0)
+    # Sum and count of the grades of active reviews, adjusted by the
+    # rating worker from the deltas review changes record; rating is
+    # derived from them.
+    rating_sum: Mapped[int] = mc(Integer, server_default=text('0'), nullable=False)
+    rating_count: Mapped[int] = mc(Integer, server_default=text('0'), nullable=False)
+    rating: Mapped[float] = mc(
+        Float,
+        Computed(RATING_EXPRESSION, persisted=True),
+        nullable=False
+    )
     is_active: Mapped[bool] = mc(Boolean, default=True)
+    # Bumped by every UPDATE, ETags of product responses are built from it.
+    version: Mapped[int] = mc(
+        Integer,
+        server_default=text('1'),
+        onupdate=literal_column('version + 1'),
+        nullable=False
+    )
+    updated_at: Mapped[datetime] = mc(
+        DateTime(timezone=True),
+        server_default=func.now(),
+        onupdate=func.now(),
+        nullable=False
+    )
 
 
     tsv: Mapped[str] = mc(
@@ -70,6 +104,21 @@ class Product(Base):
         back_populates='product'
     )
 
+    # Fetch version/updated_at with RETURNING on flush instead of leaving
+    # them expired for a lazy load.
+    __mapper_args__ = {'eager_defaults': True}
+
     __table_args__ = (
         Index("ix_products_tsv_gin", "tsv", postgresql_using="gin"),
+        # Partial indexes for the /products listing, which always filters
+        # on is_active IS true and orders by id.
+        Index("ix_products_active_id", "id", postgresql_where=text("is_active IS TRUE")),
+        Index("ix_products_active_category_id", "category_id", "id",
+              postgresql_where=text("is_active IS TRUE")),
+        Index("ix_products_active_seller_id", "seller_id", "id",
+              postgresql_where=text("is_active IS TRUE")),
+        Index("ix_products_active_price", "price", postgresql_where=text("is_active IS TRUE")),
+        Index("ix_products_active_rating", "rating", postgresql_where=text("is_active IS TRUE")),
+        Index("ix_products_active_in_stock_id", "id",
+              postgresql_where=text("is_active IS TRUE AND stock > 0")),
     )
\ No newline at end of file
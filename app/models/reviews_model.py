@@ -1,5 +1,5 @@
 from sqlalchemy.orm import Mapped, mapped_column as mc, relationship
-from sqlalchemy import ForeignKey, String, Boolean, Integer, DateTime, UniqueConstraint
+from sqlalchemy import ForeignKey, String, Boolean, Integer, DateTime, UniqueConstraint, Index
 from datetime import datetime, timezone
 from app.database import Base
 
@@ -9,6 +9,7 @@ class Review(Base):
 
     __table_args__ = (
         UniqueConstraint("buyer_id", "product_id", name="uq_reviews_buyer_product"),
+        Index("ix_reviews_product_active_date", "product_id", "is_active", "comment_date", "id"),
     )
 
     id: Mapped[int] = mc(primary_key=True, index=True)
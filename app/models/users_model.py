@@ -2,7 +2,7 @@ from enum import Enum as PyEnum
 from sqlalchemy import Enum
 
 
-from sqlalchemy import String, Boolean
+from sqlalchemy import String, Boolean, Integer, text
 from sqlalchemy.orm import Mapped, mapped_column as mc, relationship
 from app.database import Base
 
@@ -19,6 +19,9 @@ class User(Base):
     hashed_password: Mapped[str] = mc(String(500), nullable=False)
     is_active: Mapped[bool] = mc(Boolean, default=True)
     role: Mapped[UserRole] = mc(Enum(UserRole), default=UserRole.buyer)
+    # Carried in tokens as the "ver" claim, bumping it revokes every token
+    # issued before.
+    token_version: Mapped[int] = mc(Integer, server_default=text('1'), nullable=False)
 
     products = relationship(
         'Product',
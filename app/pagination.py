@@ -0,0 +1,28 @@
+import base64
+import hashlib
+import json
+
+
+def encode_cursor(data: dict) -> str:
+    raw = json.dumps(data, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).rstrip(b'=').decode()
+
+
+def decode_cursor(cursor: str) -> dict:
+    """
+    Opposite of encode_cursor. Raises ValueError for anything
+    that was not produced by encode_cursor.
+    """
+    padded = cursor + '=' * (-len(cursor) % 4)
+    try:
+        data = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (ValueError, TypeError) as e:
+        raise ValueError('Invalid cursor') from e
+
+    if not isinstance(data, dict):
+        raise ValueError('Invalid cursor')
+    return data
+
+
+def query_digest(value: str) -> str:
+    return hashlib.sha1(value.encode()).hexdigest()[:12]
@@ -0,0 +1,127 @@
+import asyncio
+import time
+
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from app import metrics
+from app.config import RATING_FLUSH_INTERVAL, RATING_FLUSH_BATCH
+from app.database import async_session_maker
+from app.cache.product_cache import invalidate_product_listing
+from app.repositories.reviews_repo import ReviewsRepo
+from app.services.product_service import ProductService
+from app.logger import logger
+
+
+class RatingWorker:
+    """
+    Applies the rating deltas of review changes in the background.
+
+    Review writes record their grade changes in product_rating_deltas, in
+    their own transaction and without touching the product row, and
+    enqueue the product id after committing. Enqueues arriving while a
+    flush is scheduled are coalesced into it. At most every
+    `flush_interval` seconds the pending deltas are added up per product
+    and applied, `batch_size` deltas per set-based UPDATE and transaction;
+    a burst of reviews of one product costs one UPDATE of its row, and a
+    rating is at most about `flush_interval` plus one flush behind its
+    reviews.
+
+    The deltas live in the database, so nothing is lost when a flush
+    fails (it is retried) or the process dies: every worker drains all
+    pending deltas, whichever process wrote them, at start, on every
+    flush and in stop().
+    """
+
+    def __init__(self, session_maker: async_sessionmaker, flush_interval: float, batch_size: int):
+        self.session_maker = session_maker
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.enqueued = 0
+        self.coalesced = 0
+        self.flushes = 0
+        self.applied = 0
+        self.changed = 0
+        self.failures = 0
+        self._pending_since: float | None = None
+        self._wakeup = asyncio.Event()
+        self._task: asyncio.Task | None = None
+
+    def enqueue(self, product_id: int):
+        self.enqueued += 1
+        if self._wakeup.is_set():
+            self.coalesced += 1
+            return
+        self._pending_since = self._pending_since or time.monotonic()
+        self._wakeup.set()
+
+    async def start(self):
+        if self._task is None:
+            # deltas left behind by a process that died
+            self._wakeup.set()
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+    async def _run(self):
+        while True:
+            await self._wakeup.wait()
+            # everything enqueued meanwhile goes into this flush
+            await asyncio.sleep(self.flush_interval)
+            self._wakeup.clear()
+            await self.flush()
+
+    async def flush(self):
+        self._pending_since = None
+        self.flushes += 1
+        while True:
+            try:
+                taken, changed = await self._apply()
+            except BaseException as e:
+                # the deltas stay in the table for the next flush
+                self._pending_since = self._pending_since or time.monotonic()
+                self._wakeup.set()
+                if not isinstance(e, Exception):
+                    raise
+                self.failures += 1
+                logger.exception('Rating worker: applying rating deltas failed')
+                return
+            self.applied += taken
+            self.changed += len(changed)
+            if taken < self.batch_size:
+                return
+
+    async def _apply(self) -> tuple[int, list[int]]:
+        async with self.session_maker() as session:
+            taken, changed = await ReviewsRepo(session).apply_rating_deltas(self.batch_size)
+            await session.commit()
+
+        if changed:
+            for product_id in changed:
+                invalidate_product_listing(product_id)
+            async with self.session_maker() as session:
+                await ProductService(session).refresh_suggest_entries(set(changed))
+        return taken, changed
+
+    def stats(self) -> dict:
+        return {
+            'oldest_pending_s': round(time.monotonic() - self._pending_since, 3) if self._pending_since else None,
+            'enqueued': self.enqueued,
+            'coalesced': self.coalesced,
+            'flushes': self.flushes,
+            'applied': self.applied,
+            'changed': self.changed,
+            'failures': self.failures,
+        }
+
+
+rating_worker = RatingWorker(async_session_maker, flush_interval=RATING_FLUSH_INTERVAL, batch_size=RATING_FLUSH_BATCH)
+
+metrics.register('rating_worker', rating_worker.stats)
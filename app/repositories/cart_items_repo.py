@@ -1,23 +1,39 @@
-from sqlalchemy import select, delete
+from decimal import Decimal
+
+from sqlalchemy import select, delete, func, literal, literal_column, true, and_, values, column, Integer
+from sqlalchemy.dialects.postgresql import insert
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.models.cart_items_model import CartItem as CartItemModel
 from app.models.products_model import Product as ProductModel
-from app.models.categories_model import Category as CategoryModel
+from app.cache.category_snapshot import active_category_filter
+from app.repositories.products_repo import EXPORT_COLUMNS as PRODUCT_COLUMNS
 
-from sqlalchemy.orm import selectinload
+from sqlalchemy.orm import selectinload, contains_eager, load_only
 
 
 class CartItemRepo:
     def __init__(self, db: AsyncSession):
         self.db = db
 
-    async def get_cart_buyer(self, buyer_id: int):
-
-        return (
-            await self.db.scalars(
-                select(CartItemModel)
-                .options(selectinload(CartItemModel.product))
+    async def get_cart_buyer(self, buyer_id: int) -> tuple[list[CartItemModel], int, Decimal]:
+        """
+        The buyer's cart lines with the product columns CartItemSchema shows,
+        in one query, and the cart's total quantity and price computed
+        along with them by window sums.
+        """
+        rows = (
+            await self.db.execute(
+                select(
+                    CartItemModel,
+                    func.sum(CartItemModel.quantity).over().label('total_quantity'),
+                    func.sum(CartItemModel.quantity * ProductModel.price).over().label('total_price'),
+                )
+                .join(CartItemModel.product)
+                .options(
+                    load_only(CartItemModel.id, CartItemModel.quantity, CartItemModel.product_id),
+                    contains_eager(CartItemModel.product).load_only(*PRODUCT_COLUMNS),
+                )
                 .where(
                     CartItemModel.buyer_id == buyer_id,
                 )
@@ -25,17 +41,144 @@ class CartItemRepo:
             )
         ).all()
 
+        if not rows:
+            return [], 0, Decimal("0")
+        return [row.CartItem for row in rows], rows[0].total_quantity, rows[0].total_price
+
+    async def get_cart_summary(self, buyer_id: int):
+        return (
+            await self.db.execute(
+                select(
+                    func.count(CartItemModel.id).label('items'),
+                    func.coalesce(func.sum(CartItemModel.quantity), 0).label('total_quantity'),
+                    func.coalesce(func.sum(CartItemModel.quantity * ProductModel.price), 0).label('total_price'),
+                )
+                .join(CartItemModel.product)
+                .where(CartItemModel.buyer_id == buyer_id)
+            )
+        ).one()
+
     async def get_active_product(self, product_id: int):
 
         return await self.db.scalar(
             select(ProductModel)
-            .join(CategoryModel)
             .where(
                 ProductModel.id == product_id,
                 ProductModel.is_active.is_(True),
-                CategoryModel.is_active.is_(True),
+                *await active_category_filter(self.db),
+            )
+        )
+
+    async def upsert_item(self, buyer_id: int, product_id: int, quantity: int):
+        """
+        Adds `quantity` of a product to the cart in one statement: inserts
+        the line or, on conflict with uq_cart_items_user_product, increases
+        it, in both cases only if the product is active and the resulting
+        quantity fits its stock.
+
+        Returns None for a missing or inactive product, otherwise the
+        product's columns with `cart_item_id` and `quantity`, which are
+        None when the stock was not enough.
+        """
+        product = (
+            select(*PRODUCT_COLUMNS)
+            .where(
+                ProductModel.id == product_id,
+                ProductModel.is_active.is_(True),
+                *await active_category_filter(self.db),
+            )
+            .cte('product')
+        )
+
+        stmt = insert(CartItemModel).from_select(
+            ['buyer_id', 'product_id', 'quantity'],
+            select(literal(buyer_id), product.c.id, literal(quantity))
+            .where(product.c.stock >= quantity)
+        )
+        upserted = (
+            stmt.on_conflict_do_update(
+                constraint='uq_cart_items_user_product',
+                set_={'quantity': CartItemModel.quantity + stmt.excluded.quantity, 'updated_at': func.now()},
+                where=CartItemModel.quantity + stmt.excluded.quantity <= select(product.c.stock).scalar_subquery()
+            )
+            .returning(CartItemModel.id, CartItemModel.quantity)
+            .cte('upserted')
+        )
+
+        return (await self.db.execute(
+            select(product, upserted.c.id.label('cart_item_id'), upserted.c.quantity)
+            .select_from(product.outerjoin(upserted, true()))
+        )).first()
+
+    async def get_batch_products(self, buyer_id: int, product_ids: list[int]):
+        """
+        For each existing product of `product_ids`: its stock, whether it can
+        be put into a cart (`available`) and the buyer's current quantity,
+        None when it is not in the cart.
+        """
+        return (await self.db.execute(
+            select(
+                ProductModel.id,
+                ProductModel.stock,
+                and_(ProductModel.is_active.is_(True), *await active_category_filter(self.db)).label('available'),
+                CartItemModel.quantity,
+            )
+            .outerjoin(CartItemModel, and_(CartItemModel.product_id == ProductModel.id,
+                                           CartItemModel.buyer_id == buyer_id))
+            .where(ProductModel.id.in_(product_ids))
+        )).all()
+
+    async def add_items(self, buyer_id: int, quantities: dict[int, int]) -> list[int]:
+        """
+        Adds to the quantity of each product in one statement, inserting
+        the lines that are missing. The sum is taken by the upsert, not
+        from a quantity read earlier, so concurrent adds all count. Like
+        upsert_item, a line is only written if the resulting quantity fits
+        the product's stock.
+
+        Returns the ids of the products that were added, the others were
+        short on stock.
+        """
+        added = values(column('product_id', Integer), column('quantity', Integer), name='added').data(
+            sorted(quantities.items())
+        )
+        stmt = insert(CartItemModel).from_select(
+            ['buyer_id', 'product_id', 'quantity'],
+            select(literal(buyer_id), added.c.product_id, added.c.quantity)
+            .join(ProductModel, ProductModel.id == added.c.product_id)
+            .where(ProductModel.stock >= added.c.quantity)
+        )
+        # The subquery refers to the proposed row by name, SQLAlchemy would
+        # otherwise add "cart_items AS excluded" to its FROM.
+        stock = (select(ProductModel.stock)
+                 .where(ProductModel.id == literal_column('excluded.product_id'))
+                 .scalar_subquery())
+        result = await self.db.scalars(
+            stmt.on_conflict_do_update(
+                constraint='uq_cart_items_user_product',
+                set_={'quantity': CartItemModel.quantity + stmt.excluded.quantity, 'updated_at': func.now()},
+                where=CartItemModel.quantity + stmt.excluded.quantity <= stock
             )
+            .returning(CartItemModel.product_id)
         )
+        return result.all()
+
+    async def set_items(self, buyer_id: int, quantities: dict[int, int]):
+        """
+        Sets the quantity of each product, adding the lines that are missing.
+        """
+        stmt = insert(CartItemModel).values([
+            {'buyer_id': buyer_id, 'product_id': product_id, 'quantity': quantity}
+            for product_id, quantity in sorted(quantities.items())
+        ])
+        await self.db.execute(stmt.on_conflict_do_update(
+            constraint='uq_cart_items_user_product',
+            set_={'quantity': stmt.excluded.quantity, 'updated_at': func.now()},
+        ))
+
+    async def remove_items(self, buyer_id: int, product_ids: list[int]):
+        await self.db.execute(delete(CartItemModel).where(CartItemModel.buyer_id == buyer_id,
+                                                          CartItemModel.product_id.in_(product_ids)))
 
     async def get_product_cart(
         self, buyer_id: int, product_id: int
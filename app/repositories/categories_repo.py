@@ -1,5 +1,5 @@
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
+from sqlalchemy import select, func
 from app.models.categories_model import Category as CategoryModel
 
 
@@ -13,11 +13,22 @@ class CategoryRepo:
             CategoryModel.id == category_id, 
             CategoryModel.is_active.is_(active)))
 
-    async def get_all_categories(self, active: bool = True):
-        categories = await self.db.scalars(select(CategoryModel).where(
-            CategoryModel.is_active.is_(active)))
+    async def get_all_categories(self, active: bool | None = True):
+        stmt = select(CategoryModel)
+        if active is not None:
+            stmt = stmt.where(CategoryModel.is_active.is_(active))
+        categories = await self.db.scalars(stmt)
         return categories.all()
 
+    async def get_version_token(self) -> tuple[int, int]:
+        """
+        Changes whenever a category is added or updated (every UPDATE bumps
+        its version).
+        """
+        count, versions = (await self.db.execute(
+            select(func.count(), func.coalesce(func.sum(CategoryModel.version), 0)))).one()
+        return count, int(versions)
+
     async def get_by_name(self, name: str):
         return await self.db.scalar(
         select(CategoryModel).where(CategoryModel.name == name)
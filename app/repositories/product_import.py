@@ -0,0 +1,82 @@
+from sqlalchemy import (
+    Table, MetaData, Column, Integer, String, Numeric,
+    select, func, case, and_, literal, true
+)
+from sqlalchemy.dialects.postgresql import insert
+
+from app.models.products_model import Product as ProductModel
+from app.models.categories_model import Category as CategoryModel
+
+
+# Session-local table the upload is COPYed into. It lives for one
+# transaction only, so concurrent imports never see each other's rows.
+product_import_staging = Table(
+    'product_import_staging', MetaData(),
+    Column('row_no', Integer, nullable=False),
+    Column('name', String(50), nullable=False),
+    Column('description', String(500)),
+    Column('price', Numeric(10, 2), nullable=False),
+    Column('image_url', String(200)),
+    Column('stock', Integer, nullable=False),
+    Column('category_id', Integer, nullable=False),
+    prefixes=['TEMPORARY'],
+    postgresql_on_commit='DROP',
+)
+
+STAGING_COLUMNS = [column.name for column in product_import_staging.columns]
+PRODUCT_COLUMNS = STAGING_COLUMNS[1:]
+
+
+def merge_statement(seller_id: int):
+    """
+    Checks the staged rows against each other and against the catalog and
+    inserts the valid ones, all in one statement. Yields
+    (row_no, name, id, error) per staged row; id is set for inserted rows,
+    error is 'duplicate_name', 'name_exists' or 'category_not_found' otherwise.
+    """
+    staged = product_import_staging
+    checked = (
+        select(
+            staged,
+            case(
+                (func.row_number().over(partition_by=staged.c.name, order_by=staged.c.row_no) > 1,
+                 'duplicate_name'),
+                (ProductModel.id.is_not(None), 'name_exists'),
+                (CategoryModel.id.is_(None), 'category_not_found'),
+            ).label('error'),
+        )
+        .select_from(
+            staged
+            .outerjoin(ProductModel, ProductModel.name == staged.c.name)
+            .outerjoin(CategoryModel, and_(CategoryModel.id == staged.c.category_id,
+                                           CategoryModel.is_active.is_(True)))
+        )
+        .cte('checked')
+    )
+
+    # ON CONFLICT covers names taken by a concurrent import after `checked`
+    # was read; such rows come back without an id.
+    inserted = (
+        insert(ProductModel.__table__)
+        .from_select(
+            [*PRODUCT_COLUMNS, 'seller_id', 'is_active'],
+            select(*(checked.c[name] for name in PRODUCT_COLUMNS),
+                   literal(seller_id), true())
+            .where(checked.c.error.is_(None))
+            .order_by(checked.c.row_no)
+        )
+        .on_conflict_do_nothing(index_elements=['name'])
+        .returning(ProductModel.id, ProductModel.name)
+        .cte('inserted')
+    )
+
+    return (
+        select(
+            checked.c.row_no,
+            checked.c.name,
+            inserted.c.id,
+            func.coalesce(checked.c.error, case((inserted.c.id.is_(None), 'name_exists'))).label('error'),
+        )
+        .select_from(checked.outerjoin(inserted, and_(checked.c.error.is_(None),
+                                                      inserted.c.name == checked.c.name)))
+    )
@@ -0,0 +1,151 @@
+from sqlalchemy import Column, select, func, desc, or_, and_, true, tuple_, literal_column
+from sqlalchemy.sql import visitors
+
+from app.models.products_model import Product as ProductModel
+from app.cache.product_cache import listing_fingerprint, normalize_search
+
+
+# Equality filters that usually narrow a listing down to a small slice of
+# the catalog. Together with search they make the whole match set cheap
+# enough to count in the page query itself.
+SELECTIVE_COLUMNS = frozenset({'category_id', 'seller_id'})
+
+# Lower bounds of the facet buckets, the first bucket starts at 0 and the
+# last one is open-ended (rating tops out at 5).
+PRICE_BUCKETS = (10, 50, 100, 500, 1000, 5000)
+RATING_BUCKETS = (1, 2, 3, 4)
+
+
+def filter_columns(filters: list) -> frozenset[str]:
+    return frozenset(
+        element.key
+        for clause in filters
+        for element in visitors.iterate(clause)
+        if isinstance(element, Column) and element.table is ProductModel.__table__
+    )
+
+
+class ProductListingQuery:
+    """
+    Statements of one product listing.
+
+    The search text is turned into tsqueries once, in the `ts_query` CTE,
+    and both the match predicate and the rank reference its columns.
+
+    Two plans are available for a page plus its total:
+    - 'window': one statement, the total comes from count(*) OVER ();
+    - 'split': the page statement and a separate count statement, which
+      lets an unselective ORDER BY id LIMIT stop early and lets the count
+      be served from cache.
+    """
+
+    def __init__(self, filters: list, search: str | None = None):
+        self.base_filters = list(filters)
+        self.filters = list(filters)
+        self.search = normalize_search(search)
+        self.fingerprint = listing_fingerprint(filters, search)
+        self.columns = filter_columns(filters)
+
+        self.ts_query = None
+        self.rank = None
+        if self.search:
+            self.ts_query = select(
+                func.websearch_to_tsquery('english', self.search).label('en'),
+                func.websearch_to_tsquery('russian', self.search).label('ru'),
+            ).cte('ts_query')
+
+            self.filters.append(or_(
+                ProductModel.tsv.op('@@')(self.ts_query.c.en),
+                ProductModel.tsv.op('@@')(self.ts_query.c.ru),
+            ))
+            self.rank = func.greatest(
+                func.ts_rank_cd(ProductModel.tsv, self.ts_query.c.en),
+                func.ts_rank_cd(ProductModel.tsv, self.ts_query.c.ru),
+            )
+
+    @property
+    def is_selective(self) -> bool:
+        return bool(self.search) or bool(self.columns & SELECTIVE_COLUMNS)
+
+    def choose_strategy(self, cursor: dict | None, need_total: bool) -> str:
+        # A window count under a keyset predicate would only count the rows
+        # after the cursor, so cursor pages always count separately.
+        if not need_total or cursor is not None:
+            return 'split'
+        return 'window' if self.is_selective else 'split'
+
+    def _select(self, *columns):
+        stmt = select(*columns).select_from(ProductModel)
+        if self.ts_query is not None:
+            stmt = stmt.join(self.ts_query, true())
+        return stmt.where(*self.filters)
+
+    def count_statement(self):
+        return self._select(func.count())
+
+    def facets_statement(self):
+        """
+        Category, price bucket and rating bucket counts of the listing in a
+        single GROUPING SETS aggregate. `grouping_id` tells which set a row
+        belongs to: 3 - category, 5 - price, 6 - rating.
+        """
+        price_bucket = func.width_bucket(
+            ProductModel.price,
+            literal_column(f"ARRAY[{', '.join(map(str, PRICE_BUCKETS))}]::numeric[]")
+        )
+        rating_bucket = func.width_bucket(
+            ProductModel.rating,
+            literal_column(f"ARRAY[{', '.join(map(str, RATING_BUCKETS))}]::float8[]")
+        )
+        return (
+            self._select(
+                ProductModel.category_id,
+                price_bucket.label('price_bucket'),
+                rating_bucket.label('rating_bucket'),
+                func.grouping(ProductModel.category_id, price_bucket, rating_bucket).label('grouping_id'),
+                func.count().label('count'),
+            )
+            .group_by(func.grouping_sets(
+                tuple_(ProductModel.category_id),
+                tuple_(price_bucket),
+                tuple_(rating_bucket),
+            ))
+        )
+
+    def estimate_statement(self):
+        return self._select(ProductModel.id)
+
+    def page_statement(
+            self,
+            page: int,
+            page_size: int,
+            cursor: dict | None = None,
+            with_total: bool = False,
+            entity: tuple = (ProductModel,)
+    ):
+        columns = list(entity)
+        rank_col = None
+        if self.rank is not None:
+            rank_col = self.rank.label('rank')
+            columns.append(rank_col)
+        if with_total:
+            columns.append(func.count().over().label('total'))
+
+        stmt = self._select(*columns)
+
+        if rank_col is not None:
+            if cursor is not None:
+                stmt = stmt.where(or_(
+                    self.rank < cursor['rank'],
+                    and_(self.rank == cursor['rank'], ProductModel.id > cursor['id'])
+                ))
+            stmt = stmt.order_by(desc(rank_col), ProductModel.id)
+        else:
+            if cursor is not None:
+                stmt = stmt.where(ProductModel.id > cursor['id'])
+            stmt = stmt.order_by(ProductModel.id)
+
+        if cursor is None:
+            stmt = stmt.offset((page - 1) * page_size)
+
+        return stmt.limit(page_size + 1)
@@ -1,7 +1,37 @@
+import json
+
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, func, desc, or_
+from sqlalchemy import select, update, func, any_, bindparam, case, and_, column, Integer, Numeric
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.schema import CreateTable
 from app.models.products_model import Product as ProductModel
 from app.models.categories_model import Category as CategoryModel
+from app.cache.product_cache import product_count_cache, product_search_cache, product_facet_cache
+from app.repositories.product_listing import ProductListingQuery, PRICE_BUCKETS, RATING_BUCKETS
+from app.repositories.query_shapes import product_listing_shapes
+from app.cache.category_snapshot import category_snapshot, active_category_filter
+from app.cache.read_through import read_through
+from app.models.product_rating_stats_model import ProductRatingStats as StatsModel, GRADES
+from app.schemas.products import ProductDetail, ProductRatingSummary
+from app.repositories.product_import import product_import_staging, STAGING_COLUMNS, merge_statement
+
+
+# Everything ProductSchema exposes, the tsv column is left out of exports.
+EXPORT_COLUMNS = (
+    ProductModel.id, ProductModel.name, ProductModel.description, ProductModel.price,
+    ProductModel.image_url, ProductModel.stock, ProductModel.category_id,
+    ProductModel.seller_id, ProductModel.rating, ProductModel.is_active,
+)
+
+
+def _bucket_range(bounds: tuple, bucket: int, count: int, upper: float | None = None) -> dict:
+    # width_bucket() returns 0 below the first bound and len(bounds) at or
+    # above the last one.
+    return {
+        'min': bounds[bucket - 1] if bucket > 0 else 0,
+        'max': bounds[bucket] if bucket < len(bounds) else upper,
+        'count': count,
+    }
 
 
 class ProductRepo:
@@ -15,71 +45,226 @@ class ProductRepo:
             filters: list | None = None,
             search: str | None = None,
             page: int = 1,
-            page_size: int = 20
+            page_size: int = 20,
+            cursor: dict | None = None,
+            total_mode: str = 'exact',
+            strategy: str | None = None,
+            versions_only: bool = False
     ):
-        filters = filters or []
-
-        total_stmt = select(func.count()).select_from(ProductModel).where(*filters)
-
-        rank_col = None
-        if search:
-            search_value = search.strip()
-            if search_value:
-                ts_query_en = func.websearch_to_tsquery('english', search_value)
-                ts_query_ru = func.websearch_to_tsquery('russian', search_value)
-                
-                ts_match_any = or_(
-                    ProductModel.tsv.op('@@')(ts_query_en),
-                    ProductModel.tsv.op('@@')(ts_query_ru)
-                )
-                filters.append(ts_match_any)
-
-                rank_col = func.greatest(
-                    func.ts_rank_cd(ProductModel.tsv, ts_query_en),
-                    func.ts_rank_cd(ProductModel.tsv, ts_query_ru)
-                ).label('rank')
-                total_stmt = select(func.count()).select_from(ProductModel).where(*filters)
-
-        total = await self.db.scalar(total_stmt) or 0
-
-        if rank_col is not None:
-            stmt = (
-                select(ProductModel, rank_col)
-                .where(*filters)
-                .order_by(desc(rank_col), ProductModel.id)
-                .offset((page - 1) * page_size)
-                .limit(page_size)
+        """
+        Returns (items, total, next_key). With `versions_only` the items are
+        (id, version) rows instead of products, enough for the page's ETag.
+
+        With `cursor` (the key of the last row of the previous page) the page
+        is located by a keyset predicate instead of OFFSET, so its cost does
+        not depend on how deep the client has paged. `next_key` is the key of
+        the last returned row, or None when there are no more rows.
+
+        `total_mode` is 'exact' (cached count(*)), 'estimated' (planner row
+        estimate) or 'none' (total is None). `strategy` forces the 'window'
+        or 'split' plan of ProductListingQuery, by default it is picked from
+        the selectivity of the filters.
+        """
+        listing = ProductListingQuery(filters or [], search)
+        paging = 'cursor' if cursor is not None else 'offset'
+
+        total = None
+        count_generation = product_count_cache.generation
+        if total_mode == 'exact':
+            total = product_count_cache.get(listing.fingerprint)
+        elif total_mode == 'estimated':
+            total = await self.estimate_count(listing.estimate_statement())
+        need_total = total_mode == 'exact' and total is None
+
+        page_key = None
+        if listing.search:
+            page_key = (
+                listing.fingerprint,
+                page_size,
+                tuple(sorted(cursor.items())) if cursor is not None else page
             )
-            result = await self.db.execute(stmt)
-            items = [row[0] for row in result.all()]
+            cached = product_search_cache.get(page_key)
+            if cached is not None:
+                product_listing_shapes.record(listing.base_filters, True, paging, 'search-cache')
+                items = await self.get_products_by_ids(cached.ids, listing.base_filters, versions_only)
+                if need_total:
+                    total = await self.count_products(listing, count_generation)
+                return items, total, cached.next_key
+            search_generation = product_search_cache.generation
+
+        if strategy is None:
+            strategy = listing.choose_strategy(cursor=cursor, need_total=need_total)
+        with_total = strategy == 'window' and need_total and cursor is None
+
+        product_listing_shapes.record(listing.base_filters, bool(listing.search), paging,
+                                      'window' if with_total else 'split')
+
+        entity = (ProductModel.id, ProductModel.version) if versions_only else (ProductModel,)
+        stmt = listing.page_statement(page, page_size, cursor=cursor, with_total=with_total, entity=entity)
+        rows = (await self.db.execute(stmt)).all()
+
+        if need_total:
+            if with_total and rows:
+                total = rows[0].total
+                product_count_cache.set(listing.fingerprint, total, generation=count_generation)
+            else:
+                total = await self.count_products(listing, count_generation)
+
+        has_more = len(rows) > page_size
+        rows = rows[:page_size]
+        items = rows if versions_only else [row[0] for row in rows]
+
+        next_key = None
+        if has_more:
+            last = rows[-1]
+            next_key = {'id': items[-1].id}
+            if listing.rank is not None:
+                next_key['rank'] = last.rank
 
+        if page_key is not None:
+            product_search_cache.set(page_key, tuple(item.id for item in items), next_key,
+                                     generation=search_generation)
+
+        return items, total, next_key
+
+
+    async def get_facets(self, filters: list | None = None, search: str | None = None) -> dict:
+        listing = ProductListingQuery(filters or [], search)
+
+        facets = product_facet_cache.get(listing.fingerprint)
+        if facets is not None:
+            return facets
+
+        generation = product_facet_cache.generation
+        rows = (await self.db.execute(listing.facets_statement())).all()
+
+        categories, prices, ratings = [], [], []
+        for row in rows:
+            if row.grouping_id == 3:
+                categories.append({'category_id': row.category_id, 'count': row.count})
+            elif row.grouping_id == 5:
+                prices.append(_bucket_range(PRICE_BUCKETS, row.price_bucket, row.count))
+            elif row.grouping_id == 6:
+                ratings.append(_bucket_range(RATING_BUCKETS, row.rating_bucket, row.count, upper=5))
+
+        facets = {
+            'categories': sorted(categories, key=lambda item: item['category_id']),
+            'price': sorted(prices, key=lambda item: item['min']),
+            'rating': sorted(ratings, key=lambda item: item['min']),
+        }
+        product_facet_cache.set(listing.fingerprint, facets, generation=generation)
+        return facets
+
+
+    async def count_products(self, listing: ProductListingQuery, generation: int) -> int:
+        total = await self.db.scalar(listing.count_statement()) or 0
+        product_count_cache.set(listing.fingerprint, total, generation=generation)
+        return total
+
+
+    async def get_products_by_ids(self, ids: tuple[int, ...], filters: list | None = None,
+                                  versions_only: bool = False):
+        """
+        Rows for `ids` in the same order, fetched with a single
+        id = ANY(...) lookup. Rows that no longer pass `filters` are skipped.
+        With `versions_only` they are (id, version) rows.
+        """
+        if not ids:
+            return []
+
+        where = (ProductModel.id == any_(bindparam('ids', list(ids), type_=ARRAY(Integer))), *(filters or []))
+        if versions_only:
+            rows = (await self.db.execute(select(ProductModel.id, ProductModel.version).where(*where))).all()
         else:
-            stmt = (
-                select(ProductModel)
-                .where(*filters)
-                .order_by(ProductModel.id)
-                .offset((page - 1) * page_size)
-                .limit(page_size)
-            )
-            items = (await self.db.scalars(stmt)).all()
+            rows = (await self.db.scalars(select(ProductModel).where(*where))).all()
+        by_id = {row.id: row for row in rows}
+        return [by_id[product_id] for product_id in ids if product_id in by_id]
+
 
-        return items, total
+    async def estimate_count(self, stmt) -> int:
+        """
+        Row count the planner expects `stmt` to return, without running it.
+        """
+        compiled = stmt.compile(dialect=self.db.bind.dialect)
+        params = tuple(compiled.params[name] for name in compiled.positiontup)
+
+        conn = await self.db.connection()
+        plan = (await conn.exec_driver_sql(f'EXPLAIN (FORMAT JSON) {compiled.string}', params)).scalar()
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        return max(int(plan[0]['Plan']['Plan Rows']), 0)
 
 
     async def get_all_products(self, active: bool = True):
         products = await self.db.scalars(select(ProductModel)
-                                            .join(CategoryModel).where(CategoryModel.is_active == True, 
-                                                                        ProductModel.is_active == active))
+                                         .where(ProductModel.is_active.is_(active),
+                                                *await active_category_filter(self.db)))
         
         return products.all()
 
+
+
+    async def stream_all_products(self, active: bool = True, chunk_size: int = 1000):
+        """
+        Same rows as get_all_products, read through a server-side cursor
+        and yielded in chunks of `chunk_size` plain rows (no ORM objects).
+        """
+        stmt = (select(*EXPORT_COLUMNS)
+                .where(ProductModel.is_active.is_(active), *await active_category_filter(self.db))
+                .order_by(ProductModel.id)
+                .execution_options(yield_per=chunk_size))
+
+        result = await self.db.stream(stmt)
+        async for chunk in result.partitions(chunk_size):
+            yield chunk
+
             
 
     async def get_product(self, product_id: int, active: bool = True):
-        return await self.db.scalar(select(ProductModel)
-                                    .join(CategoryModel).where(ProductModel.id == product_id, 
-                                                               CategoryModel.is_active.is_(True), 
-                                                               ProductModel.is_active.is_(active)))    
+        product = await self.db.scalar(select(ProductModel).where(ProductModel.id == product_id,
+                                                                  ProductModel.is_active.is_(active)))
+        if product is None or not (await category_snapshot.current(self.db)).is_active(product.category_id):
+            return None
+        return product
+    
+    
+
+    @read_through('product', tags=lambda view: (f'product:{view.id}', f'category:{view.category_id}'))
+    async def get_product_view(self, product_id: int, active: bool = True) -> ProductDetail | None:
+        """
+        Cached read-only get_product for the GET endpoints.
+        """
+        product = await self.get_product(product_id, active=active)
+        return ProductDetail.model_validate(product) if product is not None else None
+
+
+
+    # Like a review, the summary does not know its category and goes with
+    # any category change.
+    @read_through('rating_summary', tags=lambda view: (f'product:{view.product_id}', 'categories'))
+    async def get_rating_summary(self, product_id: int) -> ProductRatingSummary | None:
+        """
+        Rating and grade counts of an active product, from the product row
+        and product_rating_stats; reviews are not read.
+        """
+        row = (await self.db.execute(
+            select(ProductModel.id, ProductModel.rating, ProductModel.rating_count,
+                   *(func.coalesce(getattr(StatsModel, f'grade_{grade}'), 0) for grade in GRADES))
+            .outerjoin(StatsModel, StatsModel.product_id == ProductModel.id)
+            .where(ProductModel.id == product_id,
+                   ProductModel.is_active.is_(True),
+                   *await active_category_filter(self.db))
+        )).first()
+        if row is None:
+            return None
+
+        product_id, rating, rating_count, *counts = row
+        return ProductRatingSummary(
+            product_id=product_id,
+            rating=rating,
+            rating_count=rating_count,
+            grades={grade: count for grade, count in sorted(zip(GRADES, counts), reverse=True)},
+        )
     
     
 
@@ -90,16 +275,110 @@ class ProductRepo:
 
 
     async def checking_category_activity(self, category_id: int):
-        return await self.db.scalar(select(CategoryModel).where(
-            CategoryModel.id == category_id, 
-            CategoryModel.is_active.is_(True)))
+        snapshot = await category_snapshot.current(self.db)
+        return snapshot.by_id[category_id] if snapshot.is_active(category_id) else None
     
 
 
+    async def get_suggest_entries(self, product_ids: set[int] | None = None):
+        stmt = (select(ProductModel.id, ProductModel.name, ProductModel.rating)
+                .where(ProductModel.is_active.is_(True), *await active_category_filter(self.db)))
+        if product_ids is not None:
+            stmt = stmt.where(ProductModel.id == any_(bindparam('ids', list(product_ids), type_=ARRAY(Integer))))
+        result = await self.db.execute(stmt)
+        return result.all()
+
+
+
+    async def import_products(self, records: list[tuple], seller_id: int):
+        """
+        COPYs `records` (tuples in STAGING_COLUMNS order) into a temporary
+        staging table and merges them into products with merge_statement.
+        Runs in the session's transaction, the caller commits.
+        """
+        conn = await self.db.connection()
+        await conn.execute(CreateTable(product_import_staging))
+
+        raw = await conn.get_raw_connection()
+        await raw.driver_connection.copy_records_to_table(
+            product_import_staging.name, records=records, columns=STAGING_COLUMNS)
+
+        result = await self.db.execute(merge_statement(seller_id))
+        return result.all()
+
+
+
+    async def bulk_update_products(self, items: list[dict], seller_id: int):
+        """
+        Applies (product_id, price, stock) items in one UPDATE ... FROM
+        unnest(...). A None price or stock keeps the current value. Returns
+        (product_id, outcome) in input order, outcome being 'updated',
+        'not_found' (missing, inactive or in an inactive category),
+        'forbidden' (another seller's product) or 'duplicate' (product
+        already listed earlier in the batch). The caller commits.
+        """
+        batch = (
+            func.unnest(
+                bindparam('ids', [item['product_id'] for item in items], type_=ARRAY(Integer)),
+                bindparam('prices', [item['price'] for item in items], type_=ARRAY(Numeric(10, 2))),
+                bindparam('stocks', [item['stock'] for item in items], type_=ARRAY(Integer)),
+            )
+            .table_valued(column('product_id', Integer), column('price', Numeric(10, 2)),
+                          column('stock', Integer), with_ordinality='ord')
+            .render_derived()
+        )
+        target = (
+            select(
+                batch,
+                case((CategoryModel.id.is_not(None), ProductModel.seller_id)).label('seller_id'),
+                (func.row_number().over(partition_by=batch.c.product_id, order_by=batch.c.ord) > 1)
+                .label('duplicate'),
+            )
+            .select_from(
+                batch
+                .outerjoin(ProductModel, and_(ProductModel.id == batch.c.product_id,
+                                              ProductModel.is_active.is_(True)))
+                .outerjoin(CategoryModel, and_(CategoryModel.id == ProductModel.category_id,
+                                               CategoryModel.is_active.is_(True)))
+            )
+            .cte('target')
+        )
+        updated = (
+            update(ProductModel)
+            .where(ProductModel.id == target.c.product_id,
+                   target.c.seller_id == seller_id,
+                   target.c.duplicate.is_(False))
+            .values(price=func.coalesce(target.c.price, ProductModel.price),
+                    stock=func.coalesce(target.c.stock, ProductModel.stock))
+            .returning(ProductModel.id)
+            .cte('updated')
+        )
+        stmt = (
+            select(
+                target.c.product_id,
+                case(
+                    (updated.c.id.is_not(None), 'updated'),
+                    (target.c.duplicate, 'duplicate'),
+                    (and_(target.c.seller_id.is_not(None), target.c.seller_id != seller_id), 'forbidden'),
+                    else_='not_found',
+                ).label('outcome'),
+            )
+            .select_from(
+                target.outerjoin(updated, and_(updated.c.id == target.c.product_id,
+                                               target.c.duplicate.is_(False)))
+            )
+            .order_by(target.c.ord)
+        )
+        return (await self.db.execute(stmt)).all()
+
+
+
     async def get_products_category(self, category_id: int):
+        if not (await category_snapshot.current(self.db)).is_active(category_id):
+            return []
+
         products = await self.db.scalars(select(ProductModel)
-                                         .join(CategoryModel).where(ProductModel.category_id == category_id, 
-                                                                    CategoryModel.is_active.is_(True), 
-                                                                    ProductModel.is_active.is_(True)))
+                                         .where(ProductModel.category_id == category_id, 
+                                                ProductModel.is_active.is_(True)))
         
         return products.all()
\ No newline at end of file
@@ -0,0 +1,55 @@
+from collections import Counter
+
+from sqlalchemy.sql.elements import BinaryExpression
+
+from app import metrics
+from app.logger import logger
+
+
+def describe_filter(clause) -> str:
+    """
+    Column and operator of a filter without its value,
+    e.g. 'price:ge' for `ProductModel.price >= 10`.
+    """
+    if isinstance(clause, BinaryExpression) and hasattr(clause.left, 'key'):
+        return f'{clause.left.key}:{getattr(clause.operator, "__name__", clause.operator)}'
+    return type(clause).__name__
+
+
+class QueryShapeRecorder:
+    """
+    Counts the shapes of listing queries (which filters, search, paging
+    mode and plan) so index coverage can be checked against real traffic.
+    A summary of the most frequent shapes is logged every `log_every`
+    recorded queries and is available through /metrics/.
+    """
+
+    def __init__(self, name: str, log_every: int = 1000, top: int = 20):
+        self.name = name
+        self.log_every = log_every
+        self.top = top
+        self.recorded = 0
+        self._shapes: Counter[str] = Counter()
+
+    def record(self, filters: list, search: bool, paging: str, plan: str):
+        parts = sorted(describe_filter(clause) for clause in filters)
+        if search:
+            parts.append('search')
+        shape = f'{",".join(parts) or "-"} | {paging} | {plan}'
+
+        self._shapes[shape] += 1
+        self.recorded += 1
+        if self.recorded % self.log_every == 0:
+            logger.info(f'Query shapes of {self.name} after {self.recorded} queries: '
+                        f'{self._shapes.most_common(self.top)}')
+
+    def stats(self) -> dict:
+        return {
+            'recorded': self.recorded,
+            'shapes': dict(self._shapes.most_common(self.top)),
+        }
+
+
+product_listing_shapes = QueryShapeRecorder('product listing')
+
+metrics.register('product_listing_shapes', product_listing_shapes.stats)
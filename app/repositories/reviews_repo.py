@@ -1,66 +1,105 @@
+from datetime import datetime
+
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, func
+from sqlalchemy import select, update, delete, union, union_all, func, tuple_, literal, values, column, Integer, and_
+from sqlalchemy.dialects.postgresql import insert
 
-from app.models.categories_model import Category as CategoryModel
+from app.cache.category_snapshot import active_category_filter
+from app.cache.read_through import read_through
+from app.cache.invalidation import invalidate_on_commit
+from app.schemas.reviews import ReviewDetail
 from app.models.products_model import Product as ProductModel
 from app.models.reviews_model import Review as ReviewModel
+from app.models.product_rating_stats_model import ProductRatingStats as StatsModel, GRADES
+from app.models.product_rating_deltas_model import ProductRatingDelta as DeltaModel
+
+
+EXPORT_COLUMNS = (
+    ReviewModel.id, ReviewModel.buyer_id, ReviewModel.product_id, ReviewModel.comment,
+    ReviewModel.comment_date, ReviewModel.grade, ReviewModel.is_active,
+)
 
 
 class ReviewsRepo:
     def __init__(self, db: AsyncSession):
         self.db = db
 
-    async def get_reviews(self, active: bool = True):
+    def _reviews_select(self, *columns, active: bool = True, product_id: int | None = None,
+                        after: tuple[datetime, int] | None = None, category_filter: list = ()):
+        stmt = select(*columns)
+        if product_id is None:
+            stmt = (stmt.join(ProductModel)
+                    .where(ProductModel.is_active.is_(True), *category_filter))
+        else:
+            stmt = stmt.where(ReviewModel.product_id == product_id)
+
+        stmt = stmt.where(ReviewModel.is_active.is_(active))
+        if after is not None:
+            stmt = stmt.where(tuple_(ReviewModel.comment_date, ReviewModel.id) < tuple_(*after))
+        return stmt.order_by(ReviewModel.comment_date.desc(), ReviewModel.id.desc())
+
+    async def get_reviews(self, active: bool = True, product_id: int | None = None,
+                          limit: int = 20, after: tuple[datetime, int] | None = None):
+        """
+        Newest first, keyset paginated on (comment_date, id). Returns up to
+        `limit` + 1 reviews, the extra one only tells that a next page exists.
+        A `product_id` listing is expected to be checked with
+        check_active_product beforehand and is served from
+        ix_reviews_product_active_date without joins.
+        """
         reviews = await self.db.scalars(
-            select(ReviewModel)
-            .join(ProductModel)
-            .join(CategoryModel)
-            .where(
-                CategoryModel.is_active.is_(True),
-                ProductModel.is_active.is_(True),
-                ReviewModel.is_active.is_(active),
-            )
+            self._reviews_select(ReviewModel, active=active, product_id=product_id, after=after,
+                                 category_filter=await active_category_filter(self.db))
+            .limit(limit + 1)
         )
         return reviews.all()
 
-    async def get_review(self, review_id: int, active: bool = True):
-        return await self.db.scalar(
+    async def stream_reviews(self, active: bool = True, product_id: int | None = None,
+                             after: tuple[datetime, int] | None = None, chunk_size: int = 1000):
+        stmt = (self._reviews_select(*EXPORT_COLUMNS, active=active, product_id=product_id, after=after,
+                                     category_filter=await active_category_filter(self.db))
+                .execution_options(yield_per=chunk_size))
+
+        result = await self.db.stream(stmt)
+        async for chunk in result.partitions(chunk_size):
+            yield chunk
+
+    async def get_review(self, review_id: int, active: bool = True, for_update: bool = False):
+        """
+        With `for_update` the review row is locked until the end of the
+        transaction, as needed before recording a rating change.
+        """
+        stmt = (
             select(ReviewModel)
             .join(ProductModel)
-            .join(CategoryModel)
             .where(
                 ReviewModel.id == review_id,
                 ReviewModel.is_active.is_(active),
                 ProductModel.is_active.is_(True),
-                CategoryModel.is_active.is_(True),
+                *await active_category_filter(self.db),
             )
         )
+        if for_update:
+            stmt = stmt.with_for_update(of=ReviewModel).execution_options(populate_existing=True)
+        return await self.db.scalar(stmt)
+
+    # The view does not know its category, so it goes with any category
+    # change through the 'categories' tag.
+    @read_through('review', tags=lambda view: (f'review:{view.id}', f'product:{view.product_id}', 'categories'))
+    async def get_review_view(self, review_id: int) -> ReviewDetail | None:
+        review = await self.get_review(review_id)
+        return ReviewDetail.model_validate(review) if review is not None else None
 
     async def check_active_product(self, product_id: int):
         return await self.db.scalar(
             select(ProductModel)
-            .join(CategoryModel)
             .where(
                 ProductModel.id == product_id,
                 ProductModel.is_active.is_(True),
-                CategoryModel.is_active.is_(True),
+                *await active_category_filter(self.db),
             )
         )
 
-    async def get_review_product(self, product_id: int):
-        reviews_for_products = await self.db.scalars(
-            select(ReviewModel)
-            .join(ProductModel)
-            .join(CategoryModel)
-            .where(
-                ReviewModel.product_id == product_id,
-                ReviewModel.is_active.is_(True),
-                ProductModel.is_active.is_(True),
-                CategoryModel.is_active.is_(True),
-            )
-        )
-        return reviews_for_products.all()
-
     async def get_review_user(self, buyer_id: int, product_id: int):
         return await self.db.scalar(
             select(ReviewModel).where(
@@ -70,20 +109,195 @@ class ReviewsRepo:
             )
         )
 
-    async def get_avg_rating(self, product_id: int):
-        return await self.db.scalar(
-            select(func.avg(ReviewModel.grade)).where(
-                ReviewModel.product_id == product_id, ReviewModel.is_active.is_(True)
+    async def record_rating_change(self, product_id: int, old_grade: int | None, new_grade: int | None):
+        """
+        Records in the current transaction that a review of the product
+        stopped counting with `old_grade` and counts with `new_grade` now,
+        None for not counted (new, inactive). Appends rows to
+        product_rating_deltas without touching the product row; the review
+        must be locked (or new) so that a change cannot be recorded twice.
+        """
+        rows = []
+        if old_grade is not None:
+            rows.append({'product_id': product_id, 'grade': old_grade, 'delta': -1})
+        if new_grade is not None:
+            rows.append({'product_id': product_id, 'grade': new_grade, 'delta': 1})
+        if rows:
+            await self.db.execute(insert(DeltaModel), rows)
+
+    async def apply_rating_deltas(self, limit: int) -> tuple[int, list[int]]:
+        """
+        Takes up to `limit` of the oldest pending rating deltas, adds them
+        up per product into rating_sum, rating_count and the grade counts,
+        and deletes them, all in the current transaction. Rows another
+        transaction is applying are skipped, so concurrent callers split
+        the work. Returns the number of deltas taken and the ids of the
+        products that changed.
+        """
+        grades = [f'grade_{grade}' for grade in GRADES]
+        taken = (
+            delete(DeltaModel)
+            .where(DeltaModel.id.in_(
+                select(DeltaModel.id).order_by(DeltaModel.id).limit(limit).with_for_update(skip_locked=True)
+            ))
+            .returning(DeltaModel.product_id, DeltaModel.grade, DeltaModel.delta)
+            .cte('taken')
+        )
+        rows = (await self.db.execute(
+            select(taken.c.product_id,
+                   func.count().label('taken'),
+                   *(func.coalesce(func.sum(taken.c.delta).filter(taken.c.grade == grade), 0).label(f'grade_{grade}')
+                     for grade in GRADES),
+                   func.sum(taken.c.grade * taken.c.delta).label('rating_sum'),
+                   func.sum(taken.c.delta).label('rating_count'))
+            .group_by(taken.c.product_id)
+        )).all()
+        count = sum(row.taken for row in rows)
+        # a grade change within the batch can cancel out
+        rows = [row for row in rows if any(getattr(row, name) for name in grades)]
+        if not rows:
+            return count, []
+
+        # Same lock order as reconcile_ratings. FOR NO KEY UPDATE, unlike
+        # FOR UPDATE, doesn't block the foreign key checks of review writes.
+        locked = set((await self.db.scalars(
+            select(ProductModel.id)
+            .where(ProductModel.id.in_([row.product_id for row in rows]))
+            .order_by(ProductModel.id)
+            .with_for_update(key_share=True)
+        )).all())
+        rows = [row for row in rows if row.product_id in locked]
+        if not rows:
+            return count, []
+
+        deltas = values(
+            column('product_id', Integer), *(column(name, Integer) for name in grades),
+            column('rating_sum', Integer), column('rating_count', Integer),
+            name='deltas'
+        ).data([(row.product_id, *(getattr(row, name) for name in grades), row.rating_sum, row.rating_count)
+                for row in rows])
+
+        upsert = insert(StatsModel).from_select(
+            ['product_id', *grades],
+            select(deltas.c.product_id, *(deltas.c[name] for name in grades))
+        )
+        await self.db.execute(
+            upsert.on_conflict_do_update(
+                index_elements=['product_id'],
+                set_={**{name: StatsModel.__table__.c[name] + upsert.excluded[name] for name in grades},
+                      'updated_at': func.now()}
+            )
+        )
+        # No column of `deltas` is called version, see reconcile_ratings.
+        await self.db.execute(
+            update(ProductModel)
+            .where(ProductModel.id == deltas.c.product_id)
+            .values(rating_sum=ProductModel.rating_sum + deltas.c.rating_sum,
+                    rating_count=ProductModel.rating_count + deltas.c.rating_count)
+        )
+
+        product_ids = sorted(row.product_id for row in rows)
+        invalidate_on_commit(self.db, *(f'product:{product_id}' for product_id in product_ids))
+        return count, product_ids
+
+    async def find_rating_drift(self, first_id: int, last_id: int) -> list[int]:
+        """
+        Ids of products in [first_id, last_id) whose rating_sum,
+        rating_count or grade counts disagree with their active reviews,
+        after the pending deltas. Read without locks, so a review change in
+        flight may show up here; reconcile_ratings rechecks.
+        """
+        actual = self._actual_ratings(
+            lambda product_id: and_(product_id >= first_id, product_id < last_id)
+        ).subquery('actual')
+        stored = tuple_(ProductModel.rating_sum, ProductModel.rating_count,
+                        *(func.coalesce(getattr(StatsModel, f'grade_{grade}'), 0) for grade in GRADES))
+        return (await self.db.scalars(
+            select(actual.c.product_id)
+            .join(ProductModel, ProductModel.id == actual.c.product_id)
+            .outerjoin(StatsModel, StatsModel.product_id == actual.c.product_id)
+            .where(stored != tuple_(actual.c.rating_sum, actual.c.rating_count,
+                                    *(actual.c[f'grade_{grade}'] for grade in GRADES)))
+            .order_by(actual.c.product_id)
+        )).all()
+
+    async def get_max_product_id(self) -> int:
+        return await self.db.scalar(select(func.coalesce(func.max(ProductModel.id), 0)))
+
+    async def reconcile_ratings(self, product_ids: list[int]) -> list[int]:
+        """
+        Rewrites rating_sum, rating_count and the grade counts of
+        `product_ids` to what their reviews give once the pending deltas
+        are applied, in one statement, and returns the ids whose values
+        actually changed.
+
+        The products are locked first, and the reviews and deltas are read
+        by the next statement, with a newer snapshot. A rating worker
+        applying deltas of these products either committed before (its
+        deltas are gone and counted) or waits for this transaction and
+        then adds deltas this statement still saw as pending.
+        """
+        await self.db.execute(
+            select(ProductModel.id)
+            .where(ProductModel.id.in_(product_ids))
+            .order_by(ProductModel.id)
+            .with_for_update(key_share=True)
+        )
+
+        grades = [f'grade_{grade}' for grade in GRADES]
+        actual = self._actual_ratings(lambda product_id: product_id.in_(product_ids)).cte('actual')
+        upsert = insert(StatsModel).from_select(
+            ['product_id', *grades],
+            select(actual.c.product_id, *(actual.c[name] for name in grades))
+        )
+        stats = (
+            upsert.on_conflict_do_update(
+                index_elements=['product_id'],
+                set_={**{name: upsert.excluded[name] for name in grades}, 'updated_at': func.now()},
+                where=(tuple_(*(StatsModel.__table__.c[name] for name in grades))
+                       != tuple_(*(upsert.excluded[name] for name in grades)))
             )
+            .returning(StatsModel.product_id)
+            .cte('stats')
+        )
+        # No column of `actual` is called version, the unqualified
+        # "version + 1" of ProductModel's onupdate must stay unambiguous.
+        products = (
+            update(ProductModel)
+            .where(ProductModel.id == actual.c.product_id,
+                   tuple_(ProductModel.rating_sum, ProductModel.rating_count)
+                   != tuple_(actual.c.rating_sum, actual.c.rating_count))
+            .values(rating_sum=actual.c.rating_sum, rating_count=actual.c.rating_count)
+            .returning(ProductModel.id.label('product_id'))
+            .cte('products_updated')
         )
 
-    async def update_product_rating(self, product_id: int):
-        product = await self.check_active_product(product_id)
-        if not product:
-            return None
-        avg_grade = await self.get_avg_rating(product_id)
-        product.rating = round(avg_grade or 0, 2)
+        result = await self.db.scalars(
+            union(select(products.c.product_id), select(stats.c.product_id))
+        )
+        product_ids = sorted(result.all())
+        invalidate_on_commit(self.db, *(f'product:{product_id}' for product_id in product_ids))
+        return product_ids
 
-        self.db.add(product)
-        await self.db.commit()
-        await self.db.refresh(product)
+    def _actual_ratings(self, product_filter):
+        """
+        Rating aggregates the products matching `product_filter(id column)`
+        should store: those of their active reviews less the deltas still
+        pending, zeros for products without any.
+        """
+        contributions = union_all(
+            select(ReviewModel.product_id, ReviewModel.grade, literal(1).label('delta'))
+            .where(ReviewModel.is_active.is_(True), product_filter(ReviewModel.product_id)),
+            select(DeltaModel.product_id, DeltaModel.grade, (-DeltaModel.delta).label('delta'))
+            .where(product_filter(DeltaModel.product_id)),
+        ).subquery('contributions')
+        return (
+            select(ProductModel.id.label('product_id'),
+                   *(func.coalesce(func.sum(contributions.c.delta).filter(contributions.c.grade == grade), 0)
+                     .label(f'grade_{grade}') for grade in GRADES),
+                   func.coalesce(func.sum(contributions.c.grade * contributions.c.delta), 0).label('rating_sum'),
+                   func.coalesce(func.sum(contributions.c.delta), 0).label('rating_count'))
+            .outerjoin(contributions, contributions.c.product_id == ProductModel.id)
+            .where(product_filter(ProductModel.id))
+            .group_by(ProductModel.id)
+        )
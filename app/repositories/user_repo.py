@@ -1,6 +1,8 @@
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
+from sqlalchemy import select, update
 from app.models.users_model import User as UserModel
+from app.cache.read_through import read_through
+from app.schemas.users import AuthUser
 
 class UserRepo:
     def __init__(self, db: AsyncSession):
@@ -14,6 +16,19 @@ class UserRepo:
         return await self.db.scalar(stmt)    
 
 
+    @read_through('auth_user', tags=lambda user: (f'user:{user.id}',))
+    async def get_auth_user(self, user_id: int) -> AuthUser | None:
+        """
+        What authorization needs to know about a user, inactive ones included
+        so that revoked users are cached too.
+        """
+        user = (await self.db.execute(select(
+            UserModel.id, UserModel.email, UserModel.role,
+            UserModel.is_active, UserModel.token_version
+        ).where(UserModel.id == user_id))).first()
+        return AuthUser.model_validate(user) if user is not None else None
+
+
     async def get_active_users(self):
         users =  await self.db.scalars(select(UserModel)
                                        .where(UserModel.is_active))
@@ -22,4 +37,16 @@ class UserRepo:
 
     async def delete_user(self, user_id: int):
         return await self.db.scalar(select(UserModel).where(UserModel.id == user_id,
-                                                      UserModel.is_active.is_(True)))
\ No newline at end of file
+                                                      UserModel.is_active.is_(True)))
+
+
+    async def update_password_hash(self, user_id: int, old_hash: str, new_hash: str) -> bool:
+        """
+        Replaces the hash only if it is still `old_hash`, a password changed
+        in the meantime wins.
+        """
+        result = await self.db.execute(update(UserModel)
+                                       .where(UserModel.id == user_id,
+                                              UserModel.hashed_password == old_hash)
+                                       .values(hashed_password=new_hash))
+        return result.rowcount == 1
@@ -1,7 +1,8 @@
 from fastapi import APIRouter, Depends, status, Path
 from typing import Annotated
 
-from app.models.users_model import User as UserModel, UserRole
+from app.models.users_model import UserRole
+from app.schemas.users import AuthUser
 from app.auth.dependencies import get_current_user_with_role
 from app.dependencies import CartItemService, get_cart_item_service
 
@@ -10,6 +11,8 @@ from app.schemas.cartitems import (
     CartItemSchema,
     CartItemCreate,
     CartItemUpdate,
+    CartBatchUpdate,
+    CartSummary,
 )
 
 router = APIRouter(prefix="/cart", tags=["Cart"])
@@ -18,17 +21,38 @@ router = APIRouter(prefix="/cart", tags=["Cart"])
 @router.get("/", response_model=Cart)
 async def get_cart(
     service: CartItemService = Depends(get_cart_item_service),
-    current_buyer: UserModel = Depends(get_current_user_with_role(UserRole.buyer)),
+    current_buyer: AuthUser = Depends(get_current_user_with_role(UserRole.buyer)),
 ):
 
     return await service.get_cart(buyer_id=current_buyer.id)
 
 
+@router.get("/summary", response_model=CartSummary)
+async def get_cart_summary(
+    service: CartItemService = Depends(get_cart_item_service),
+    current_buyer: AuthUser = Depends(get_current_user_with_role(UserRole.buyer)),
+):
+
+    return await service.get_cart_summary(buyer_id=current_buyer.id)
+
+
+@router.patch("/", response_model=Cart)
+async def update_cart(
+    payload: CartBatchUpdate,
+    service: CartItemService = Depends(get_cart_item_service),
+    current_buyer: AuthUser = Depends(get_current_user_with_role(UserRole.buyer)),
+):
+
+    return await service.apply_batch(
+        operations=[operation.model_dump() for operation in payload.operations], buyer_id=current_buyer.id
+    )
+
+
 @router.post("/items", response_model=CartItemSchema, status_code=status.HTTP_201_CREATED)
 async def add_item_to_cart(
     payload: CartItemCreate,
     service: CartItemService = Depends(get_cart_item_service),
-    current_buyer: UserModel = Depends(get_current_user_with_role(UserRole.buyer)),
+    current_buyer: AuthUser = Depends(get_current_user_with_role(UserRole.buyer)),
 ):
 
 
@@ -43,7 +67,7 @@ async def update_cart_item(
     payload: CartItemUpdate, 
     product_id: Annotated[int, Path(ge=1)],
     service: CartItemService = Depends(get_cart_item_service),
-    current_buyer: UserModel = Depends(get_current_user_with_role(UserRole.buyer))):
+    current_buyer: AuthUser = Depends(get_current_user_with_role(UserRole.buyer))):
 
 
     return await service.update_cart_item(product_id=product_id, quantity=payload.quantity, buyer_id=current_buyer.id)
@@ -53,7 +77,7 @@ async def update_cart_item(
 async def remove_item_from_cart(
     product_id: int,
     service: CartItemService = Depends(get_cart_item_service),
-    current_buyer: UserModel = Depends(get_current_user_with_role(UserRole.buyer))
+    current_buyer: AuthUser = Depends(get_current_user_with_role(UserRole.buyer))
 ):
     return await service.remove_item_from_cart(
         product_id=product_id,
@@ -64,7 +88,7 @@ async def remove_item_from_cart(
 @router.delete('/', status_code=status.HTTP_204_NO_CONTENT)
 async def clear_cart(
     service: CartItemService = Depends(get_cart_item_service),
-    current_buyer: UserModel = Depends(get_current_user_with_role(UserRole.buyer))):
+    current_buyer: AuthUser = Depends(get_current_user_with_role(UserRole.buyer))):
 
     return await service.clear_cart(
         buyer_id=current_buyer.id
@@ -1,11 +1,13 @@
-from fastapi import APIRouter, Depends, status, Path
+from fastapi import APIRouter, Depends, Request, Response, status, Path
 from typing import Annotated
 
 
 from app.dependencies import get_category_service
 from app.schemas.categories import CategorySchema, CreateCategorySchema
-from app.models.users_model import User as UserModel, UserRole
+from app.models.users_model import UserRole
+from app.schemas.users import AuthUser
 from app.auth.dependencies import get_current_user_with_role
+from app.http_cache import conditional, entity_etag, collection_etag
 
 from app.services.category_service import CategoryService
 
@@ -19,28 +21,38 @@ router = APIRouter(
 
 
 @router.get('/', response_model=list[CategorySchema])
-async def get_all_catigories(service: CategoryService = Depends(get_category_service)):
+async def get_all_catigories(request: Request,
+                             response: Response,
+                             service: CategoryService = Depends(get_category_service)):
 
     
-    return await service.get_all_catigories(active=True)
+    categories = await service.get_all_catigories(active=True)
+    return conditional(request, response, collection_etag(categories)) or categories
 
 
 
 
 @router.get('/nonactive', response_model=list[CategorySchema])
-async def get_nonactive_catigories(service: CategoryService = Depends(get_category_service)):
+async def get_nonactive_catigories(request: Request,
+                                   response: Response,
+                                   service: CategoryService = Depends(get_category_service)):
 
 
-    return await service.get_all_catigories(active=False)
+    categories = await service.get_all_catigories(active=False)
+    return conditional(request, response, collection_etag(categories)) or categories
 
 
 
 
 @router.get('/{category_id}', response_model=CategorySchema)
 async def get_category(category_id: Annotated[int, Path(ge=1)], 
+                       request: Request,
+                       response: Response,
                        service: CategoryService = Depends(get_category_service)):
     
-    return await service.get_category(category_id=category_id)
+    category = await service.get_category(category_id=category_id)
+    return (conditional(request, response, entity_etag(category.id, category.version), category.updated_at)
+            or category)
     
 
 
@@ -48,7 +60,7 @@ async def get_category(category_id: Annotated[int, Path(ge=1)],
 @router.post('/', response_model=CategorySchema, status_code=status.HTTP_201_CREATED)
 async def create_category(category: CreateCategorySchema, 
                           service: CategoryService = Depends(get_category_service), 
-                          current_admin: UserModel = Depends(get_current_user_with_role(UserRole.admin))):
+                          current_admin: AuthUser = Depends(get_current_user_with_role(UserRole.admin))):
     
     return await service.create_category(name=category.name)
     
@@ -59,7 +71,7 @@ async def create_category(category: CreateCategorySchema,
 async def update_category(category_id: Annotated[int, Path(ge=1)], 
                           new_category: CreateCategorySchema,
                           service: CategoryService = Depends(get_category_service),
-                          current_admin: UserModel = Depends(get_current_user_with_role(UserRole.admin))):
+                          current_admin: AuthUser = Depends(get_current_user_with_role(UserRole.admin))):
     
     return await service.update_category(
         category_id, 
@@ -71,7 +83,7 @@ async def update_category(category_id: Annotated[int, Path(ge=1)],
 @router.delete('/{category_id}', response_model=dict)
 async def delete_category(category_id: Annotated[int, Path(ge=1)],
                           service: CategoryService = Depends(get_category_service),
-                          current_admin: UserModel = Depends(get_current_user_with_role(UserRole.admin))):
+                          current_admin: AuthUser = Depends(get_current_user_with_role(UserRole.admin))):
     
 
     return await service.delete_category(category_id)
@@ -83,7 +95,7 @@ async def delete_category(category_id: Annotated[int, Path(ge=1)],
 @router.patch('/{category_id}/activate', response_model=dict)
 async def category_activation(category_id: Annotated[int, Path(ge=1)], 
                           service: CategoryService = Depends(get_category_service),
-                        current_admin: UserModel = Depends(get_current_user_with_role(UserRole.admin))):
+                        current_admin: AuthUser = Depends(get_current_user_with_role(UserRole.admin))):
     
 
     return await service.category_activation(category_id)
@@ -0,0 +1,15 @@
+from fastapi import APIRouter, Depends
+
+from app import metrics
+from app.auth.dependencies import get_current_user_with_role
+from app.models.users_model import UserRole
+from app.schemas.users import AuthUser
+
+
+router = APIRouter(prefix='/metrics', tags=['Metrics'])
+
+
+@router.get('/', response_model=dict)
+async def get_metrics(current_admin: AuthUser = Depends(get_current_user_with_role(UserRole.admin))):
+
+    return metrics.collect()
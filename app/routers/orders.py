@@ -3,7 +3,8 @@ from fastapi import APIRouter, Depends, status, Query
 from app.dependencies import get_order_service, OrderService
 
 from app.auth.dependencies import get_current_user_with_role
-from app.models.users_model import User as UserModel, UserRole
+from app.models.users_model import UserRole
+from app.schemas.users import AuthUser
 
 from app.schemas.orders import Order as OrderSchema, OrderList
 
@@ -16,7 +17,7 @@ router = APIRouter(prefix="/orders", tags=["Orders"])
 )
 async def checkout(
     service: OrderService = Depends(get_order_service),
-    current_buyer: UserModel = Depends(get_current_user_with_role(UserRole.buyer)),
+    current_buyer: AuthUser = Depends(get_current_user_with_role(UserRole.buyer)),
 ):
     return await service.create_order(current_buyer.id)
 
@@ -24,7 +25,7 @@ async def checkout(
 @router.get("/", response_model=OrderList)
 async def list_orders(
     service: OrderService = Depends(get_order_service),
-    current_buyer: UserModel = Depends(get_current_user_with_role(UserRole.buyer)),
+    current_buyer: AuthUser = Depends(get_current_user_with_role(UserRole.buyer)),
     page: int = Query(1, ge=1),
     page_size: int = Query(10, ge=1, le=100),
 ):
@@ -39,7 +40,7 @@ async def list_orders(
 async def get_order(
     order_id: int,
     service: OrderService = Depends(get_order_service),
-    current_buyer: UserModel = Depends(get_current_user_with_role(UserRole.buyer)),
+    current_buyer: AuthUser = Depends(get_current_user_with_role(UserRole.buyer)),
 ):
 
     return await service.get_order(order_id=order_id, buyer_id=current_buyer.id)
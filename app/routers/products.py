@@ -1,18 +1,26 @@
-from fastapi import APIRouter, Depends, status, Path, Query
+from fastapi import APIRouter, Depends, Request, Response, status, Path, Query, UploadFile, File
 
-from typing import Annotated
+from typing import Annotated, Literal
 
 from app.auth.dependencies import get_current_user_with_role
 from app.services.product_service import ProductService
 
-from app.models.users_model import User as UserModel, UserRole
+from app.models.users_model import UserRole
+from app.schemas.users import AuthUser
 from app.schemas.products import (
     ProductSchema, 
     ProductCreateSchema, 
     ProductUpgradeSchema,
-    ProductList)
+    ProductList,
+    ProductSuggestion,
+    ProductImportReport,
+    ProductBulkUpdateSchema,
+    ProductBulkUpdateResult,
+    ProductRatingSummary)
 
 from app.dependencies import get_product_service
+from app.streaming import negotiate_export_format
+from app.http_cache import conditional, entity_etag, collection_etag
 
 
 
@@ -24,9 +32,11 @@ router = APIRouter(
 
 @router.get('/', response_model=ProductList)
 async def get_products(
+    request: Request,
+    response: Response,
     service: ProductService = Depends(get_product_service),
     page: int = Query(1, ge=1),
-    page_size: int = Query(20, le=100),
+    page_size: int = Query(20, ge=1, le=100),
     category_id: int | None = Query(None),
     search: str | None = Query(None, min_length=1),
     min_price: float | None = Query(None, ge=0),
@@ -34,11 +44,14 @@ async def get_products(
     in_stock: bool | None = Query(None),
     seller_id: int | None = Query(None),
     min_rating: float | None = Query(None, ge=0, le=5),
-    max_rating: float | None = Query(None, ge=0, le=5)
+    max_rating: float | None = Query(None, ge=0, le=5),
+    cursor: str | None = Query(None, description='next_cursor of the previous page, overrides page'),
+    include_total: Literal['true', 'false', 'estimated'] = Query('true'),
+    facets: bool = Query(False)
 ):
 
 
-    return await service.list_products(
+    params = dict(
         page=page,
         page_size=page_size,
         category_id=category_id,
@@ -48,39 +61,94 @@ async def get_products(
         seller_id=seller_id,
         in_stock=in_stock,
         min_rating=min_rating,
-        max_rating=max_rating
+        max_rating=max_rating,
+        cursor=cursor,
+        include_total=include_total,
+        facets=facets
     )
 
+    # A revalidating client gets its 304 from the page's ids and versions,
+    # without loading any product; everyone else pays nothing extra.
+    if 'if-none-match' in request.headers:
+        versions = await service.list_products(**params, versions_only=True)
+        not_modified = conditional(request, response, _listing_etag(versions))
+        if not_modified:
+            return not_modified
+
+    listing = await service.list_products(**params)
+    return conditional(request, response, _listing_etag(listing)) or listing
+
+
+def _listing_etag(listing: dict) -> str:
+    return collection_etag(
+        listing['items'],
+        listing['total'],
+        listing['total_type'],
+        listing['next_cursor'],
+        listing['facets']
+    )
+
+
+@router.get('/suggest', response_model=list[ProductSuggestion])
+async def suggest_products(q: str = Query(min_length=1, max_length=50),
+                           limit: int = Query(10, ge=1, le=10),
+                           service: ProductService = Depends(get_product_service)):
+
+
+    return service.suggest_products(query=q, limit=limit)
+
 
 @router.get('/all', response_model=list[ProductSchema])
-async def get_all_products(service: ProductService = Depends(get_product_service)):
+async def get_all_products(request: Request,
+                           format: Literal['json', 'ndjson', 'csv'] | None = Query(None),
+                           service: ProductService = Depends(get_product_service)):
 
 
+    export_format = negotiate_export_format(request.headers.get('accept'), format)
+    if export_format != 'json':
+        return service.stream_all_products(export_format=export_format)
     return await service.get_all_products()
 
 
 @router.get('/nonactive', response_model=list[ProductSchema])
-async def get_nonactive_products(service: ProductService = Depends(get_product_service)):
+async def get_nonactive_products(request: Request,
+                                 format: Literal['json', 'ndjson', 'csv'] | None = Query(None),
+                                 service: ProductService = Depends(get_product_service)):
 
 
+    export_format = negotiate_export_format(request.headers.get('accept'), format)
+    if export_format != 'json':
+        return service.stream_all_products(export_format=export_format, active=False)
     return await service.get_all_products(active=False)
 
 
 
 @router.get('/{product_id}', response_model=ProductSchema)
 async def get_product(product_id: Annotated[int, Path(ge=1)], 
+                      request: Request,
+                      response: Response,
                       service: ProductService = Depends(get_product_service)):
 
 
-    return await service.get_product(product_id, active=True)
+    product = await service.get_product(product_id, active=True)
+    return (conditional(request, response, entity_etag(product.id, product.version), product.updated_at)
+            or product)
     
 
 
+@router.get('/{product_id}/rating-summary', response_model=ProductRatingSummary)
+async def get_rating_summary(product_id: Annotated[int, Path(ge=1)],
+                             service: ProductService = Depends(get_product_service)):
+
+    return await service.get_rating_summary(product_id)
+
+
+
 
 @router.post('/', response_model=ProductSchema, status_code=status.HTTP_201_CREATED)
 async def create_product(new_product: ProductCreateSchema, 
                          service: ProductService = Depends(get_product_service),
-                         current_seller: UserModel = Depends(get_current_user_with_role(UserRole.seller))):
+                         current_seller: AuthUser = Depends(get_current_user_with_role(UserRole.seller))):
     
 
     return await service.create_product(
@@ -90,11 +158,36 @@ async def create_product(new_product: ProductCreateSchema,
 
 
 
+@router.post('/import', response_model=ProductImportReport)
+async def import_products(file: UploadFile = File(description='CSV with a header row or NDJSON, one product per record'),
+                          format: Literal['csv', 'ndjson'] | None = Query(None),
+                          service: ProductService = Depends(get_product_service),
+                          current_seller: AuthUser = Depends(get_current_user_with_role(UserRole.seller))):
+
+
+    return await service.import_products(file=file, seller_id=current_seller.id, import_format=format)
+
+
+
+
+@router.patch('/bulk', response_model=ProductBulkUpdateResult)
+async def bulk_update_products(update: ProductBulkUpdateSchema,
+                               service: ProductService = Depends(get_product_service),
+                               current_seller: AuthUser = Depends(get_current_user_with_role(UserRole.seller))):
+
+
+    return await service.bulk_update_products(
+        items=update.model_dump()['items'],
+        seller_id=current_seller.id)
+
+
+
+
 @router.put('/{product_id}', response_model=ProductSchema)
 async def update_product(new_product: ProductUpgradeSchema, 
                          product_id: Annotated[int, Path(ge=1)], 
                          service: ProductService = Depends(get_product_service),
-                        current_seller: UserModel = Depends(get_current_user_with_role(UserRole.seller))):
+                        current_seller: AuthUser = Depends(get_current_user_with_role(UserRole.seller))):
     
 
     return await service.update_product(
@@ -119,7 +212,7 @@ async def get_all_products_for_category(category_id: Annotated[int, Path(ge=1)],
 @router.delete('/{product_id}', response_model=dict)
 async def delete_product(product_id: Annotated[int, Path(ge=1)], 
                          service: ProductService = Depends(get_product_service),
-                        current_admin: UserModel = Depends(get_current_user_with_role(UserRole.admin))):
+                        current_admin: AuthUser = Depends(get_current_user_with_role(UserRole.admin))):
     
 
     return await service.delete_product(product_id=product_id)
@@ -130,7 +223,7 @@ async def delete_product(product_id: Annotated[int, Path(ge=1)],
 @router.patch('/{product_id}/activate', response_model=dict)
 async def activation_product(product_id: Annotated[int, Path(ge=1)], 
                              service: ProductService = Depends(get_product_service),
-                             current_admin: UserModel = Depends(get_current_user_with_role(UserRole.admin))):
+                             current_admin: AuthUser = Depends(get_current_user_with_role(UserRole.admin))):
     
 
     return await service.activation_product(product_id=product_id)
\ No newline at end of file
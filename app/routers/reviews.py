@@ -1,13 +1,15 @@
-from fastapi import APIRouter, Depends, status, Path
-from typing import Annotated
+from fastapi import APIRouter, Depends, Request, status, Path, Query
+from typing import Annotated, Literal
 
-from app.models.users_model import User as UserModel, UserRole
+from app.models.users_model import UserRole
+from app.schemas.users import AuthUser
 
-from app.schemas.reviews import ReviewSchema, ReviewsCreateSchema, ReviewsUpdateSchema
+from app.schemas.reviews import ReviewSchema, ReviewList, ReviewsCreateSchema, ReviewsUpdateSchema
 from app.services.review_service import ReviewService
 
 from app.auth.dependencies import get_current_user_with_role
 from app.dependencies import get_review_service
+from app.streaming import negotiate_export_format
 
 
 
@@ -17,18 +19,32 @@ router = APIRouter(
 )
 
 
-@router.get('/', response_model=list[ReviewSchema])
-async def get_all_reviews(service: ReviewService = Depends(get_review_service)):
+@router.get('/', response_model=ReviewList)
+async def get_all_reviews(request: Request,
+                          limit: int = Query(20, ge=1, le=100),
+                          cursor: str | None = Query(None, description='next_cursor of the previous page'),
+                          format: Literal['json', 'ndjson', 'csv'] | None = Query(None),
+                          service: ReviewService = Depends(get_review_service)):
 
-    return await service.get_all_reviews(active=True)
+    export_format = negotiate_export_format(request.headers.get('accept'), format)
+    if export_format != 'json':
+        return await service.stream_all_reviews(export_format=export_format, active=True, cursor=cursor)
+    return await service.get_all_reviews(active=True, limit=limit, cursor=cursor)
 
 
 
 
-@router.get('/nonactive', response_model=list[ReviewSchema])
-async def get_nonactive_reviews(service: ReviewService = Depends(get_review_service)):
+@router.get('/nonactive', response_model=ReviewList)
+async def get_nonactive_reviews(request: Request,
+                                limit: int = Query(20, ge=1, le=100),
+                                cursor: str | None = Query(None, description='next_cursor of the previous page'),
+                                format: Literal['json', 'ndjson', 'csv'] | None = Query(None),
+                                service: ReviewService = Depends(get_review_service)):
 
-    return await service.get_all_reviews(active=False)
+    export_format = negotiate_export_format(request.headers.get('accept'), format)
+    if export_format != 'json':
+        return await service.stream_all_reviews(export_format=export_format, active=False, cursor=cursor)
+    return await service.get_all_reviews(active=False, limit=limit, cursor=cursor)
 
 
     
@@ -44,7 +60,7 @@ async def get_review(review_id: Annotated[int, Path(ge=1)],
 @router.post('/', response_model=ReviewSchema, status_code=status.HTTP_201_CREATED)
 async def create_review(new_review: ReviewsCreateSchema, 
                         service: ReviewService = Depends(get_review_service),
-                        current_buyer: UserModel = Depends(get_current_user_with_role(UserRole.buyer))):
+                        current_buyer: AuthUser = Depends(get_current_user_with_role(UserRole.buyer))):
 
    return await service.create_review(
        buyer_id=current_buyer.id, 
@@ -58,7 +74,7 @@ async def create_review(new_review: ReviewsCreateSchema,
 async def update_review(review_id: Annotated[int, Path(ge=1)], 
                         new_review: ReviewsUpdateSchema, 
                         service: ReviewService = Depends(get_review_service),
-                        current_buyer: UserModel = Depends(get_current_user_with_role(UserRole.buyer))):
+                        current_buyer: AuthUser = Depends(get_current_user_with_role(UserRole.buyer))):
     
     return await service.update_review(
         review_id=review_id,
@@ -68,18 +84,26 @@ async def update_review(review_id: Annotated[int, Path(ge=1)],
 
 
 
-@router.get('/products/{product_id}', response_model=list[ReviewSchema])
+@router.get('/products/{product_id}', response_model=ReviewList)
 async def get_all_reviews_for_products(product_id: Annotated[int, Path(ge=1)], 
+                                       request: Request,
+                                       limit: int = Query(20, ge=1, le=100),
+                                       cursor: str | None = Query(None, description='next_cursor of the previous page'),
+                                       format: Literal['json', 'ndjson', 'csv'] | None = Query(None),
                                        service: ReviewService = Depends(get_review_service)):
 
-    return await service.get_all_reviews_for_products(product_id=product_id)
+    export_format = negotiate_export_format(request.headers.get('accept'), format)
+    if export_format != 'json':
+        return await service.stream_reviews_for_products(product_id=product_id, export_format=export_format,
+                                                         cursor=cursor)
+    return await service.get_all_reviews_for_products(product_id=product_id, limit=limit, cursor=cursor)
 
 
 
 @router.delete('/{review_id}', response_model=dict)
 async def delete_review(review_id: Annotated[int, Path(ge=1)], 
                         service: ReviewService = Depends(get_review_service),
-                        current_buyer: UserModel = Depends(get_current_user_with_role(UserRole.buyer))) -> dict:
+                        current_buyer: AuthUser = Depends(get_current_user_with_role(UserRole.buyer))) -> dict:
     
     return await service.delete_review(
         review_id=review_id, 
@@ -91,7 +115,7 @@ async def delete_review(review_id: Annotated[int, Path(ge=1)],
 @router.patch('/{review_id}', response_model=dict)
 async def activate_review(review_id: Annotated[int, Path(ge=1)], 
                         service: ReviewService = Depends(get_review_service),
-                        current_admin: UserModel = Depends(get_current_user_with_role(UserRole.admin))) -> dict:
+                        current_admin: AuthUser = Depends(get_current_user_with_role(UserRole.admin))) -> dict:
     
     return await service.activate_review(review_id=review_id)
 
@@ -6,8 +6,8 @@ from app.auth.dependencies import get_current_user_with_role
 from app.services.user_service import UserService
 from app.dependencies import get_user_service
 
-from app.models.users_model import User as UserModel, UserRole
-from app.schemas.users import UserSchema, UserCreateSchema
+from app.models.users_model import UserRole
+from app.schemas.users import UserSchema, UserCreateSchema, AuthUser
 from app.logger import logger
 
 
@@ -26,6 +26,9 @@ async def create_user(
         logger.info(f"Router: user created | id: {user.id}")
         return user
 
+    except HTTPException:
+        raise
+
     except ValueError as e:
         logger.warning(
             f"Router: registration error | email: {user_data.email} | cause: {e}"
@@ -58,7 +61,7 @@ async def refresh_token(
 @router.get("/", response_model=list[UserSchema])
 async def get_all_users(
     service: UserService = Depends(get_user_service),
-    current_admin: UserModel = Depends(get_current_user_with_role(UserRole.admin)),
+    current_admin: AuthUser = Depends(get_current_user_with_role(UserRole.admin)),
 ):
     return await service.get_all_users()
 
@@ -67,7 +70,7 @@ async def get_all_users(
 async def delete_user_logic(
     user_id: int,
     service: UserService = Depends(get_user_service),
-    current_admin: UserModel = Depends(get_current_user_with_role(UserRole.admin)),
+    current_admin: AuthUser = Depends(get_current_user_with_role(UserRole.admin)),
 ):
     logger.info(f'Router: remove user | id={user_id}')
     return await service.delete_user_logic(user_id=user_id)
@@ -1,6 +1,8 @@
-from pydantic import BaseModel, Field, ConfigDict
+from pydantic import BaseModel, Field, ConfigDict, model_validator
 from app.schemas.products import ProductSchema
+from app.config import CART_BATCH_MAX_OPERATIONS
 from decimal import Decimal
+from typing import Literal
 
 
 class CartItemBase(BaseModel):
@@ -27,6 +29,28 @@ class CartItemUpdate(BaseModel):
     quantity: int = Field(ge=1, description='New quanity products')
 
 
+class CartOperation(BaseModel):
+    """
+    One change of a PATCH request by Cart
+    """
+    op: Literal['add', 'set', 'remove'] = Field(description='"add" to the quantity, "set" it or "remove" the line')
+    product_id: int = Field(ge=1, description='Product ID')
+    quantity: int | None = Field(default=None, ge=1, description='Required for "add" and "set"')
+
+    @model_validator(mode='after')
+    def check_quantity(self):
+        if self.op != 'remove' and self.quantity is None:
+            raise ValueError(f'quantity is required for "{self.op}"')
+        return self
+
+
+class CartBatchUpdate(BaseModel):
+    """
+    Model for PATCH request by Cart, operations are applied in order
+    """
+    operations: list[CartOperation] = Field(min_length=1, max_length=CART_BATCH_MAX_OPERATIONS)
+
+
 class CartItemSchema(BaseModel):
     """
     Item in cart with product details.
@@ -52,5 +76,13 @@ class Cart(BaseModel):
 
     model_config = ConfigDict(from_attributes=True)
 
-    
 
+class CartSummary(BaseModel):
+    """
+    Totals of a cart without its contents
+    Model for GET request by Cart summary
+    """
+    buyer_id: int = Field(description='Buyer ID')
+    items: int = Field(ge=0, description='Number of cart lines')
+    total_quantity: int = Field(ge=0, description='Total quanity')
+    total_price: Decimal = Field(ge=0, description='Total price')
@@ -1,5 +1,9 @@
+from datetime import datetime
 from decimal import Decimal
-from pydantic import BaseModel, Field, ConfigDict
+from typing import Literal
+from pydantic import BaseModel, Field, ConfigDict, model_validator
+
+from app.config import PRODUCT_BULK_UPDATE_MAX_ITEMS
 
 class ProductSchema(BaseModel):
     """
@@ -18,6 +22,26 @@ class ProductSchema(BaseModel):
     is_active: bool
     model_config = ConfigDict(from_attributes=True)
 
+class ProductDetail(ProductSchema):
+    """
+    Read-only view of a Product, safe to share between requests
+    """
+
+    version: int
+    updated_at: datetime
+    model_config = ConfigDict(from_attributes=True, frozen=True)
+
+class ProductRatingSummary(BaseModel):
+    """
+    Model for GET request by a Product's rating breakdown
+    """
+
+    product_id: int
+    rating: float = Field(description="Product rating")
+    rating_count: int = Field(description="Number of active reviews")
+    grades: dict[int, int] = Field(description="Number of active reviews per grade, from 5 down to 1")
+    model_config = ConfigDict(frozen=True)
+
 class ProductCreateSchema(BaseModel):
     """
     Model for POST|request by Product
@@ -26,7 +50,7 @@ class ProductCreateSchema(BaseModel):
     name: str = Field(max_length=50, min_length=2, description='Name product')
     description: str | None = Field(default=None, max_length=500, description="Description's product")
     price: Decimal = Field(ge=0.01, le=100000.00, description="Price product")
-    image_url: str | None = Field(default=None, description="Product image")
+    image_url: str | None = Field(default=None, max_length=200, description="Product image")
     stock: int = Field(gt=0, description="Products in stock")
     category_id: int = Field(ge=1, description="Product category")
 
@@ -41,14 +65,94 @@ class ProductUpgradeSchema(BaseModel):
     name: str = Field(max_length=50, min_length=2, description='Name product')
     description: str | None = Field(default=None, max_length=500, description="Description's product")
     price: float = Field(ge=0.01, le=100000.00, description="Price product")
-    image_url: str | None = Field(default=None, description="Product image")
+    image_url: str | None = Field(default=None, max_length=200, description="Product image")
     stock: int = Field(gt=0, description="Products in stock")
 
 
+class CategoryFacet(BaseModel):
+    category_id: int = Field(description='Category ID')
+    count: int = Field(ge=0, description='Products of the category in the result set')
+
+
+class RangeFacet(BaseModel):
+    min: float = Field(description='Lower bound, inclusive')
+    max: float | None = Field(description='Upper bound, exclusive (a rating of 5 counts in 4-5); None when open-ended')
+    count: int = Field(ge=0, description='Products in the range')
+
+
+class ProductFacets(BaseModel):
+    categories: list[CategoryFacet] = Field(default_factory=list, description='Counts per category')
+    price: list[RangeFacet] = Field(default_factory=list, description='Counts per price range')
+    rating: list[RangeFacet] = Field(default_factory=list, description='Counts per rating range')
+
+
 class ProductList(BaseModel):
     items: list[ProductSchema] = Field(description='Products for the current page')
-    total: int = Field(ge=0, description='Total number of goods')
+    total: int | None = Field(default=None, ge=0,
+                              description='Total number of goods, None when include_total=false')
+    total_type: Literal['exact', 'estimated'] | None = Field(
+        default=None, description='Whether total is an exact count or a planner estimate')
     page: int = Field(ge=1, description='Current page number')
     page_size: int = Field(ge=1, description='Number of elements per page')
+    next_cursor: str | None = Field(default=None,
+                                    description='Cursor of the next page, None on the last page')
+    facets: ProductFacets | None = Field(default=None, description='Facet counts, only with facets=true')
+
+    model_config = ConfigDict(from_attributes=True)
+
+
+class ProductSuggestion(BaseModel):
+    """
+    Model for GET request by Product suggest (type-ahead)
+    """
+
+    id: int
+    name: str
+    rating: float = Field(description="Product rating")
+
+
+class ProductImportError(BaseModel):
+    row: int = Field(ge=1, description='Record number in the file, header excluded')
+    name: str | None = Field(default=None, description='Product name of the record, if it could be read')
+    detail: str = Field(description='Why the record was not imported')
+
+
+class ProductImportReport(BaseModel):
+    """
+    Model for POST request by Product import
+    """
+
+    received: int = Field(ge=0, description='Records read from the file')
+    imported: int = Field(ge=0, description='Products created')
+    errors: list[ProductImportError] = Field(default_factory=list, description='Records that were not imported')
+
+
+class ProductBulkUpdateItem(BaseModel):
+    product_id: int = Field(ge=1, description='Product to update')
+    price: Decimal | None = Field(default=None, ge=0.01, le=100000.00, description='New price, None keeps the current one')
+    stock: int | None = Field(default=None, ge=0, description='New stock, None keeps the current one')
+
+    @model_validator(mode='after')
+    def check_changes(self):
+        if self.price is None and self.stock is None:
+            raise ValueError('price or stock is required')
+        return self
+
+
+class ProductBulkUpdateSchema(BaseModel):
+    """
+    Model for PATCH request by Product bulk update
+    """
+
+    items: list[ProductBulkUpdateItem] = Field(min_length=1, max_length=PRODUCT_BULK_UPDATE_MAX_ITEMS)
+
+
+class ProductBulkUpdateOutcome(BaseModel):
+    product_id: int
+    status: Literal['updated', 'not_found', 'forbidden', 'duplicate'] = Field(
+        description='duplicate - the product already appeared earlier in the batch, only that item applies')
+
 
-    model_config = ConfigDict(from_attributes=True)
\ No newline at end of file
+class ProductBulkUpdateResult(BaseModel):
+    updated: int = Field(ge=0, description='Products changed')
+    items: list[ProductBulkUpdateOutcome] = Field(description='Outcome per item, in request order')
@@ -17,6 +17,23 @@ class ReviewSchema(BaseModel):
     model_config = ConfigDict(from_attributes=True)
 
 
+class ReviewDetail(ReviewSchema):
+    """
+    Read-only view of a Review, safe to share between requests
+    """
+
+    model_config = ConfigDict(from_attributes=True, frozen=True)
+
+
+class ReviewList(BaseModel):
+    """
+    Model for a page of Reviews, newest first
+    """
+
+    items: list[ReviewSchema] = Field(description='Reviews on the current page')
+    next_cursor: str | None = Field(default=None, description='Pass as cursor to get the next page, None on the last page')
+
+
 class ReviewsCreateSchema(BaseModel):
     """
     Model for POST|PUT|PATCH request by Reviews
@@ -31,4 +31,17 @@ class UserCreateSchema(BaseModel):
     email: EmailStr = Field(max_length=100, description="User's email")
     password: str = Field(min_length=8, description='Password should be min 8 symbols')
     role: UserRoleEnum  = Field(default=UserRoleEnum.buyer,
-                      description='Role "buyer" or "seller"')
\ No newline at end of file
+                      description='Role "buyer" or "seller"')
+
+
+class AuthUser(BaseModel):
+    """
+    Authenticated user as seen by the endpoints, cached between requests
+    """
+
+    id: int
+    email: str
+    role: UserRoleAdminEnum
+    is_active: bool
+    token_version: int
+    model_config = ConfigDict(from_attributes=True, frozen=True)
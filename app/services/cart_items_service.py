@@ -1,8 +1,7 @@
 from fastapi import HTTPException, status, Response
 from sqlalchemy.ext.asyncio import AsyncSession
-from decimal import Decimal
 
-from app.models.cart_items_model import CartItem as CartItemModel
+from app.schemas.products import ProductSchema
 
 from app.repositories.cart_items_repo import CartItemRepo
 from app.logger import logger
@@ -16,34 +15,42 @@ class CartItemService:
     async def get_cart(self, buyer_id: int) -> dict:
         logger.debug(f"Fetching cart for buyer_id={buyer_id}")
 
-        items = await self.repo.get_cart_buyer(buyer_id=buyer_id)
-
-        total_quantity = sum(item.quantity for item in items)
-        price_items = (
-            Decimal(item.quantity)
-            * (item.product.price if item.product.price is not None else Decimal("0"))
-            for item in items
-        )
-        total_price_decimal = sum(price_items, Decimal("0"))
+        items, total_quantity, total_price = await self.repo.get_cart_buyer(buyer_id=buyer_id)
 
         logger.info(
             f"Cart fetched for buyer_id={buyer_id} "
-            f"(items={len(items)}, total_price={total_price_decimal}, )"
+            f"(items={len(items)}, total_price={total_price}, )"
         )
 
         return {
             "buyer_id": buyer_id,
             "items": items,
             "total_quantity": total_quantity,
-            "total_price": total_price_decimal,
+            "total_price": total_price,
+        }
+
+    async def get_cart_summary(self, buyer_id: int) -> dict:
+        logger.debug(f"Fetching cart summary for buyer_id={buyer_id}")
+
+        summary = await self.repo.get_cart_summary(buyer_id=buyer_id)
+
+        return {
+            "buyer_id": buyer_id,
+            "items": summary.items,
+            "total_quantity": summary.total_quantity,
+            "total_price": summary.total_price,
         }
 
     async def add_item_to_cart(self, item_data: dict, buyer_id: int):
         logger.debug(f"Adding item to cart (buyer_id={buyer_id}, data={item_data})")
 
-        product = await self.repo.get_active_product(product_id=item_data["product_id"])
+        row = await self.repo.upsert_item(
+            buyer_id=buyer_id,
+            product_id=item_data["product_id"],
+            quantity=item_data["quantity"],
+        )
 
-        if not product:
+        if not row:
             logger.warning(
                 f"Attempt to add non-existent or inactive product "
                 f'id={item_data["product_id"]} to cart'
@@ -53,41 +60,27 @@ class CartItemService:
                 detail="Product not found or not active",
             )
 
-        if item_data["quantity"] > product.stock:
-            logger.warning(f"Not enough stock for product_id={product.id}")
-            raise HTTPException(status_code=400, detail="Not enough stock")
-
-        cart_item = await self.repo.get_product_cart(
-            buyer_id=buyer_id, product_id=item_data["product_id"]
-        )
+        if row.cart_item_id is None:
+            if item_data["quantity"] > row.stock:
+                logger.warning(f"Not enough stock for product_id={row.id}")
+                raise HTTPException(status_code=400, detail="Not enough stock")
 
-        if cart_item:
-            logger.debug(
-                f"Product exists in cart, updating quantity "
-                f"(cart_item_id={cart_item.id})"
+            logger.warning(f"Stock limit exceeded for product_id={row.id}")
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Cannot order more than stock",
             )
-            new_quantity = cart_item.quantity + item_data["quantity"]
-            if product.stock < new_quantity:
-                logger.warning(f"Stock limit exceeded for product_id={product.id}")
-                raise HTTPException(
-                    status_code=status.HTTP_400_BAD_REQUEST,
-                    detail="Cannot order more than stock",
-                )
-            cart_item.quantity = new_quantity
-
-        else:
-            logger.debug(f'Product not in cart - createing new cart item')
-            cart_item = CartItemModel(buyer_id=buyer_id, **item_data)
-
-            self.db.add(cart_item)
 
         await self.db.commit()
-        await self.db.refresh(cart_item, ["product"])
 
-        logger.info(f'Item added to cart (cart_item_id={cart_item.id}) '
-                    f'buyer_id={buyer_id}, quantity={cart_item.quantity}')
+        logger.info(f'Item added to cart (cart_item_id={row.cart_item_id}) '
+                    f'buyer_id={buyer_id}, quantity={row.quantity}')
 
-        return cart_item
+        return {
+            "id": row.cart_item_id,
+            "quantity": row.quantity,
+            "product": ProductSchema.model_validate(row),
+        }
 
     async def update_cart_item(self, product_id: int, quantity: int, buyer_id: int):
         logger.debug(f'Updating cart item (buyer_id{buyer_id}), product_id={product_id}'
@@ -146,6 +139,76 @@ class CartItemService:
 
         return Response(status_code=status.HTTP_204_NO_CONTENT)
 
+    async def apply_batch(self, operations: list[dict], buyer_id: int) -> dict:
+        """
+        Applies add / set / remove operations in order, all or nothing. The
+        products are checked in one query against the quantities the cart
+        ends up with. "set" adds a missing line and removing a product
+        that is not in the cart is a no-op, so a saved basket can be
+        replayed as is.
+
+        A product only ever added to goes to the database as a delta,
+        summed by the upsert itself: adds from concurrent requests all
+        count. After a "set" or "remove" the result is absolute.
+        """
+        logger.debug(f"Batch cart update (buyer_id={buyer_id}, operations={len(operations)})")
+
+        product_ids = sorted({operation["product_id"] for operation in operations})
+        rows = {row.id: row for row in await self.repo.get_batch_products(buyer_id, product_ids)}
+
+        # product_id -> quantity to add, or the final quantity (None to remove)
+        added: dict[int, int] = {}
+        absolute: dict[int, int | None] = {}
+        for operation in operations:
+            product_id = operation["product_id"]
+            if operation["op"] == "add":
+                if product_id in absolute:
+                    absolute[product_id] = (absolute[product_id] or 0) + operation["quantity"]
+                else:
+                    added[product_id] = added.get(product_id, 0) + operation["quantity"]
+            else:
+                added.pop(product_id, None)
+                absolute[product_id] = operation["quantity"] if operation["op"] == "set" else None
+
+        kept = {product_id: quantity for product_id, quantity in absolute.items() if quantity is not None}
+        unavailable = [product_id for product_id in product_ids
+                       if (product_id in added or product_id in kept)
+                       and (product_id not in rows or not rows[product_id].available)]
+        if unavailable:
+            logger.warning(f"Batch cart update with unavailable products {unavailable} (buyer_id={buyer_id})")
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"Products not found or not active: {unavailable}",
+            )
+
+        short = sorted(
+            [product_id for product_id, quantity in kept.items() if quantity > rows[product_id].stock]
+            + [product_id for product_id, quantity in added.items()
+               if (rows[product_id].quantity or 0) + quantity > rows[product_id].stock]
+        )
+        removed = [product_id for product_id, quantity in absolute.items() if quantity is None]
+        if not short:
+            if removed:
+                await self.repo.remove_items(buyer_id, removed)
+            if kept:
+                await self.repo.set_items(buyer_id, kept)
+            if added:
+                # another request may have added to the same lines meanwhile
+                short = sorted(added.keys() - set(await self.repo.add_items(buyer_id, added)))
+        if short:
+            await self.db.rollback()
+            logger.warning(f"Batch cart update exceeds stock of products {short} (buyer_id={buyer_id})")
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Not enough stock for products: {short}",
+            )
+        await self.db.commit()
+
+        logger.info(f"Cart batch applied for buyer_id={buyer_id} "
+                    f"(added={len(added)}, set={len(kept)}, removed={len(removed)})")
+
+        return await self.get_cart(buyer_id)
+
     async def clear_cart(self, buyer_id: int):
         logger.debug(f'Cleaning cart for buyer_id={buyer_id}')
         await self.repo.clear_cart(buyer_id=buyer_id)
@@ -2,7 +2,10 @@ from fastapi import HTTPException, status
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.repositories.categories_repo import CategoryRepo
+from app.services.product_service import ProductService
 from app.models.categories_model import Category as CategoryModel
+from app.cache.category_snapshot import category_snapshot
+from app.cache.invalidation import invalidate_on_commit
 
 from app.logger import logger
 
@@ -16,13 +19,15 @@ class CategoryService:
     async def get_all_catigories(self, active: bool = True):
         logger.debug(f"Fetching all categories (active={active})")
 
-        return await self.repo.get_all_categories(active)
+        snapshot = await category_snapshot.current(self.db)
+        return snapshot.active if active else snapshot.inactive
 
     async def get_category(self, category_id: int, active: bool = True):
         logger.debug(f"Fetching category id={category_id} (active={active})")
 
-        category = await self.repo.get_category(category_id, active)
-        if not category:
+        snapshot = await category_snapshot.current(self.db)
+        category = snapshot.by_id.get(category_id)
+        if not category or category.is_active != active:
             logger.warning(f"Category id={category_id} not found or inactive")
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
@@ -44,8 +49,10 @@ class CategoryService:
         new_category = CategoryModel(name=name)
 
         self.db.add(new_category)
+        invalidate_on_commit(self.db, "categories")
         await self.db.commit()
         await self.db.refresh(new_category)
+        category_snapshot.mark_dirty()
 
         logger.info(f"Category created id={new_category.id}")
 
@@ -74,8 +81,12 @@ class CategoryService:
         for key, value in update_data.items():
             setattr(category, key, value)
 
+        invalidate_on_commit(self.db, f"category:{category.id}", "categories")
         await self.db.commit()
         await self.db.refresh(category)
+        category_snapshot.mark_dirty()
+        if "is_active" in update_data:
+            await self._refresh_suggest_index()
 
         logger.info(f"Category updated id={category.id}")
 
@@ -92,7 +103,10 @@ class CategoryService:
             )
 
         category.is_active = False
+        invalidate_on_commit(self.db, f"category:{category.id}", "categories")
         await self.db.commit()
+        category_snapshot.mark_dirty()
+        await self._refresh_suggest_index()
 
         logger.info(f"Category deleted id={category.id}")
 
@@ -110,8 +124,15 @@ class CategoryService:
             )
 
         category.is_active = True
+        invalidate_on_commit(self.db, f"category:{category.id}", "categories")
         await self.db.commit()
+        category_snapshot.mark_dirty()
+        await self._refresh_suggest_index()
 
         logger.info(f"Category activated id={category.id}")
 
         return {"message": f"Category '{category.name}' restored successfully"}
+
+    async def _refresh_suggest_index(self):
+        # Suggestions only cover products of active categories
+        await ProductService(self.db).refresh_suggest_entries(None)
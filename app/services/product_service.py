@@ -1,11 +1,34 @@
-from fastapi import HTTPException, status
+from fastapi import HTTPException, UploadFile, status
+from fastapi.concurrency import run_in_threadpool
+from pydantic import ValidationError
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.models.products_model import Product as ProductModel
 from app.repositories.products_repo import ProductRepo
+from app.pagination import encode_cursor, decode_cursor, query_digest
+from app.cache.product_cache import invalidate_product_listing
+from app.cache.suggest_index import product_suggest_index
+from app.cache.invalidation import invalidate_on_commit
+from app.schemas.products import ProductSchema, ProductCreateSchema
+from app.streaming import stream_rows
+from app.importing import detect_import_format, read_rows
+from app.config import PRODUCT_IMPORT_MAX_ROWS
 from app.logger import logger
 
-from typing import Any
+from typing import Any, BinaryIO
+import csv
+
+
+IMPORT_ERRORS = {
+    'duplicate_name': 'Name repeats an earlier row of the file',
+    'name_exists': 'Product with this name already exist',
+    'category_not_found': 'Category not found or not active',
+}
+
+# Product fields listings search or filter on. A change to any of them can
+# move the product into cached search pages that don't hold it yet.
+MATCHED_FIELDS = ('name', 'description', 'price', 'stock', 'category_id')
+
 
 class ProductService:
     
@@ -26,15 +49,84 @@ class ProductService:
             in_stock: bool | None = None,
             seller_id: int | None = None,
             min_rating: float | None = None,
-            max_rating: float | None = None
+            max_rating: float | None = None,
+            cursor: str | None = None,
+            include_total: str = 'true',
+            facets: bool = False,
+            versions_only: bool = False
     ):
+        """
+        One listing page. With `versions_only` the items are (id, version)
+        rows: the same page, total, cursor and facets at a fraction of the
+        cost, for checking a conditional request's ETag.
+        """
         logger.debug(
                 f'Listing products page={page}, size={page_size}, '
                 f'filters={{ category_id={category_id}, search={search}, min_price={min_price}, '
                 f'max_price={max_price}, in_stock={in_stock}, seller_id={seller_id}, '
-                f'min_rating={min_rating}, max_rating={max_rating} }}'
+                f'min_rating={min_rating}, max_rating={max_rating} }}, cursor={cursor}'
             )
 
+        filters = self._listing_filters(
+            category_id=category_id,
+            min_price=min_price,
+            max_price=max_price,
+            in_stock=in_stock,
+            seller_id=seller_id,
+            min_rating=min_rating,
+            max_rating=max_rating
+        )
+
+        search_value = search.strip() if search else ''
+        ordering = 'rank' if search_value else 'id'
+        search_digest = query_digest(search_value) if search_value else None
+
+        key = None
+        if cursor is not None:
+            key = self._decode_listing_cursor(cursor, ordering, search_digest)
+
+        total_mode = {'true': 'exact', 'false': 'none', 'estimated': 'estimated'}[include_total]
+
+        items, total, next_key = await self.repo.get_products(
+            filters=filters,
+            search=search,
+            page=page,
+            page_size=page_size,
+            cursor=key,
+            total_mode=total_mode,
+            versions_only=versions_only
+        )
+
+        facet_counts = None
+        if facets:
+            facet_counts = await self.repo.get_facets(filters=filters, search=search)
+
+        next_cursor = None
+        if next_key is not None:
+            next_cursor = encode_cursor({**next_key, 'o': ordering, 'q': search_digest})
+
+        return {
+            'items': items,
+            'total': total,
+            'total_type': total_mode if total is not None else None,
+            'page': page,
+            'page_size': page_size,
+            'next_cursor': next_cursor,
+            'facets': facet_counts
+        }
+
+
+
+    def _listing_filters(
+            self,
+            category_id: int | None,
+            min_price: float | None,
+            max_price: float | None,
+            in_stock: bool | None,
+            seller_id: int | None,
+            min_rating: float | None,
+            max_rating: float | None
+    ) -> list[Any]:
         if min_price is not None and max_price is not None and min_price > max_price:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
@@ -68,19 +160,45 @@ class ProductService:
         if max_rating is not None:
             filters.append(ProductModel.rating <= max_rating)
 
-        items, total = await self.repo.get_products(
-            filters=filters,
-            search=search,
-            page=page,
-            page_size=page_size
-        )
+        return filters
+
+
+
+    def _decode_listing_cursor(self, cursor: str, ordering: str, search_digest: str | None) -> dict:
+        try:
+            key = decode_cursor(cursor)
+        except ValueError:
+            logger.warning(f'Malformed listing cursor: {cursor}')
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail='Invalid cursor')
+
+        valid = (key.get('o') == ordering
+                 and key.get('q') == search_digest
+                 and isinstance(key.get('id'), int))
+        if ordering == 'rank':
+            valid = valid and isinstance(key.get('rank'), (int, float))
+
+        if not valid:
+            logger.warning(f'Cursor does not match the listing query: {key}')
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
+                                detail='Cursor does not match the query')
+        return key
+
+
+
+    def suggest_products(self, query: str, limit: int):
+        logger.debug(f'Suggest products q="{query}", limit={limit}')
+        return product_suggest_index.suggest(query, limit)
 
-        return {
-            'items': items,
-            'total': total,
-            'page': page,
-            'page_size': page_size
-        }
+
+
+    async def rebuild_suggest_index(self):
+        entries = await self.repo.get_suggest_entries()
+        product_suggest_index.rebuild(entries)
+        logger.info(f'Suggest index built: {len(product_suggest_index)} products')
+
+    async def refresh_suggest_entries(self, product_ids: set[int] | None):
+        entries = await self.repo.get_suggest_entries(product_ids)
+        product_suggest_index.refresh(entries, product_ids)
 
 
 
@@ -90,10 +208,20 @@ class ProductService:
 
 
 
+    def stream_all_products(self, export_format: str, active: bool = True):
+        logger.debug(f'Streaming all products as {export_format}, active={active}')
+
+        return stream_rows(self.repo.stream_all_products(active=active),
+                           ProductSchema,
+                           export_format,
+                           filename='products' if active else 'nonactive_products')
+
+
+
     async def get_product(self, product_id: int, active: bool = True):
         logger.debug(f'Fetching product id={product_id}')
 
-        product = await self.repo.get_product(product_id=product_id, active=active)
+        product = await self.repo.get_product_view(product_id, active=active)
         if not product:
             logger.warning(f'Product not fount or inactive: id={product_id}')
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail='Product not found or not active')
@@ -102,6 +230,18 @@ class ProductService:
 
 
 
+    async def get_rating_summary(self, product_id: int):
+        logger.debug(f'Fetching rating summary id={product_id}')
+
+        summary = await self.repo.get_rating_summary(product_id)
+        if not summary:
+            logger.warning(f'Product not found or inactive: id={product_id}')
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail='Product not found or not active')
+
+        return summary
+
+
+
     async def create_product(self, data_create: dict, seller_id: int):
         logger.info(f'Seller {seller_id} attempts to create product "{data_create["name"]}"')
 
@@ -118,8 +258,12 @@ class ProductService:
         
         product = ProductModel(**data_create, seller_id=seller_id)
         self.db.add(product)
+        await self.db.flush()
+        invalidate_on_commit(self.db, f'product:{product.id}', 'product_search')
         await self.db.commit()
         await self.db.refresh(product)
+        invalidate_product_listing()
+        product_suggest_index.add(product.id, product.name, product.rating)
 
         logger.info(f'Product created: id={product.id}, name="{product.name}", seller={seller_id}')
 
@@ -127,6 +271,98 @@ class ProductService:
 
 
 
+    async def import_products(self, file: UploadFile, seller_id: int, import_format: str | None = None):
+        import_format = detect_import_format(file.filename, file.content_type, import_format)
+        if import_format is None:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
+                                detail='Unknown file format, upload .csv or .ndjson or pass format')
+
+        logger.info(f'Seller {seller_id} imports products from "{file.filename}" as {import_format}')
+
+        try:
+            records, errors = await run_in_threadpool(self._validate_import, file.file, import_format)
+        except UnicodeDecodeError:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail='File is not UTF-8 encoded')
+        except csv.Error as e:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f'Malformed CSV header: {e}')
+        except ValueError as e:
+            logger.warning(f'Import rejected for seller {seller_id}: {e}')
+            raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail=str(e))
+
+        received = len(records) + len(errors)
+        imported = []
+        if records:
+            rows = await self.repo.import_products(records, seller_id=seller_id)
+            invalidate_on_commit(self.db, 'products')
+            await self.db.commit()
+
+            for row_no, name, product_id, error in rows:
+                if error is None:
+                    imported.append((product_id, name))
+                else:
+                    errors.append({'row': row_no, 'name': name, 'detail': IMPORT_ERRORS[error]})
+
+        if imported:
+            invalidate_product_listing()
+            for product_id, name in imported:
+                product_suggest_index.add(product_id, name, 0.0)
+
+        logger.info(f'Seller {seller_id} imported {len(imported)} products, {len(errors)} rows rejected')
+
+        return {
+            'received': received,
+            'imported': len(imported),
+            'errors': sorted(errors, key=lambda error: error['row'])
+        }
+
+
+
+    def _validate_import(self, file: BinaryIO, import_format: str) -> tuple[list[tuple], list[dict]]:
+        """
+        Parses and validates every record of an upload with
+        ProductCreateSchema. Returns staging records for the valid ones and
+        error entries for the rest.
+        """
+        records, errors = [], []
+        for row_no, fields, error in read_rows(file, import_format):
+            if row_no > PRODUCT_IMPORT_MAX_ROWS:
+                raise ValueError(f'At most {PRODUCT_IMPORT_MAX_ROWS} rows can be imported at once')
+
+            name = fields.get('name') if fields else None
+            if error is None:
+                try:
+                    product = ProductCreateSchema.model_validate(fields)
+                except ValidationError as e:
+                    error = '; '.join(f'{".".join(map(str, err["loc"]))}: {err["msg"]}' for err in e.errors())
+                else:
+                    records.append((row_no, product.name, product.description, product.price,
+                                    product.image_url, product.stock, product.category_id))
+                    continue
+
+            errors.append({'row': row_no, 'name': name if isinstance(name, str) else None, 'detail': error})
+        return records, errors
+
+
+
+    async def bulk_update_products(self, items: list[dict], seller_id: int):
+        logger.info(f'Seller {seller_id} bulk updating {len(items)} products')
+
+        rows = await self.repo.bulk_update_products(items, seller_id=seller_id)
+        outcomes = [{'product_id': product_id, 'status': outcome} for product_id, outcome in rows]
+        updated_ids = [outcome['product_id'] for outcome in outcomes if outcome['status'] == 'updated']
+        invalidate_on_commit(self.db, *(f'product:{product_id}' for product_id in updated_ids))
+        await self.db.commit()
+
+        updated = len(updated_ids)
+        if updated:
+            invalidate_product_listing()
+
+        logger.info(f'Seller {seller_id} bulk update: {updated} of {len(items)} products updated')
+
+        return {'updated': updated, 'items': outcomes}
+
+
+
     async def update_product(self, product_id: int, seller_id: int, update_data: dict):
         logger.info(f'Seller {seller_id} updating product {product_id}')
 
@@ -150,10 +386,15 @@ class ProductService:
                                     detail='Product with this name already exist')  
             
         
+        rematch = any(key in MATCHED_FIELDS and getattr(product, key) != value
+                      for key, value in update_data.items())
         for key, value in update_data.items():
             setattr(product, key, value)
+        invalidate_on_commit(self.db, f'product:{product.id}', *(('product_search',) if rematch else ()))
         await self.db.commit()
         await self.db.refresh(product)
+        invalidate_product_listing(None if rematch else product.id)
+        product_suggest_index.add(product.id, product.name, product.rating)
 
         logger.info(f'Product updated: id={product.id}')
 
@@ -177,7 +418,10 @@ class ProductService:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail='Product not found or not active')
         
         product.is_active = False
+        invalidate_on_commit(self.db, f'product:{product.id}')
         await self.db.commit()
+        invalidate_product_listing(product.id)
+        product_suggest_index.remove(product.id)
         return {"message": f"Product '{product.name}' deleted successfully"}
 
 
@@ -192,5 +436,8 @@ class ProductService:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail='Product not found or already active')
         
         product.is_active = True
+        invalidate_on_commit(self.db, f'product:{product.id}', 'product_search')
         await self.db.commit()
+        invalidate_product_listing()
+        product_suggest_index.add(product.id, product.name, product.rating)
         return {"message": f"Product '{product.name}' restored successfully"}
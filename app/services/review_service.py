@@ -1,8 +1,16 @@
+from datetime import datetime
+
 from fastapi import HTTPException, status
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.models.reviews_model import Review as ReviewModel
 from app.repositories.reviews_repo import ReviewsRepo
+from app.schemas.reviews import ReviewSchema
+from app.pagination import encode_cursor, decode_cursor
+from app.streaming import stream_rows
+from app.cache.invalidation import invalidate_on_commit
+from app.cache.product_cache import invalidate_product_listing
+from app.rating_worker import rating_worker
 from app.logger import logger
 
 
@@ -11,13 +19,48 @@ class ReviewService:
         self.repo = ReviewsRepo(db)
         self.db = db
 
-    async def get_all_reviews(self, active: bool = True):
-        logger.debug(f"Service: fetching all reviews")
-        return await self.repo.get_reviews()
+    async def get_all_reviews(self, active: bool = True, limit: int = 20, cursor: str | None = None):
+        logger.debug(f"Service: fetching reviews | active={active}, limit={limit}, cursor={cursor}")
+        after = self._decode_review_cursor(cursor) if cursor else None
+        reviews = await self.repo.get_reviews(active=active, limit=limit, after=after)
+        return self._review_page(reviews, limit)
+
+    async def stream_all_reviews(self, export_format: str, active: bool = True, cursor: str | None = None):
+        logger.debug(f"Service: streaming reviews as {export_format} | active={active}")
+        after = self._decode_review_cursor(cursor) if cursor else None
+        return stream_rows(
+            self.repo.stream_reviews(active=active, after=after),
+            ReviewSchema,
+            export_format,
+            filename="reviews" if active else "nonactive_reviews",
+        )
+
+    def _review_page(self, reviews, limit: int) -> dict:
+        next_cursor = None
+        if len(reviews) > limit:
+            reviews = reviews[:limit]
+            last = reviews[-1]
+            next_cursor = encode_cursor({"d": last.comment_date.isoformat(), "id": last.id})
+        return {"items": reviews, "next_cursor": next_cursor}
+
+    def _decode_review_cursor(self, cursor: str) -> tuple[datetime, int]:
+        try:
+            key = decode_cursor(cursor)
+            comment_date = datetime.fromisoformat(key["d"])
+        except (ValueError, KeyError, TypeError):
+            key = None
+
+        if key is None or not isinstance(key.get("id"), int):
+            logger.warning(f"Service: malformed review cursor | cursor={cursor}")
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Invalid cursor",
+            )
+        return comment_date, key["id"]
 
     async def get_review(self, review_id: int):
         logger.debug(f"Service: fetching review | id={review_id}")
-        review = await self.repo.get_review(review_id)
+        review = await self.repo.get_review_view(review_id)
 
         if not review:
             logger.warning(f"Service: review not found | id={review_id}")
@@ -53,6 +96,7 @@ class ReviewService:
 
         review = ReviewModel(**create_data, buyer_id=buyer_id)
         self.db.add(review)
+        await self.repo.record_rating_change(review.product_id, None, review.grade)
         await self.db.commit()
         await self.db.refresh(review)
 
@@ -60,7 +104,7 @@ class ReviewService:
             f"Service: review created | review_id={review.id}, product_id={review.product_id}, buyer_id={buyer_id}"
         )
 
-        await self.repo.update_product_rating(review.product_id)
+        rating_worker.enqueue(review.product_id)
 
         return review
 
@@ -68,7 +112,7 @@ class ReviewService:
         logger.debug(
             f"Service: update review attempt | id={review_id}, buyer_id={buyer_id}"
         )
-        review = await self.repo.get_review(review_id)
+        review = await self.repo.get_review(review_id, for_update=True)
         if not review:
             logger.warning(f"Service: review not found | id={review_id}")
             raise HTTPException(
@@ -90,6 +134,14 @@ class ReviewService:
         for k, v in update_data.items():
             setattr(review, k, v)
 
+        grade_changed = old_grade != review.grade
+        if grade_changed:
+            logger.debug(
+                f"Service: rating changed, recording rating change | product_id={review.product_id}"
+            )
+            await self.repo.record_rating_change(review.product_id, old_grade, review.grade)
+
+        invalidate_on_commit(self.db, f"review:{review.id}")
         await self.db.commit()
         await self.db.refresh(review)
 
@@ -97,23 +149,38 @@ class ReviewService:
             f"Service: review updated | id={review.id}, product_id={review.product_id}"
         )
 
-        if old_grade != review.grade:
-            logger.debug(
-                f"Service: rating changed, updating product rating | product_id={review.product_id}"
-            )
-            await self.repo.update_product_rating(review.product_id)
+        if grade_changed:
+            rating_worker.enqueue(review.product_id)
 
         return review
 
-    async def get_all_reviews_for_products(self, product_id: int):
-        logger.debug(f"Service: fetching reviews for product | product_id={product_id}")
-        return await self.repo.get_review_product(product_id=product_id)
+    async def get_all_reviews_for_products(self, product_id: int, limit: int = 20, cursor: str | None = None):
+        logger.debug(f"Service: fetching reviews for product | product_id={product_id}, cursor={cursor}")
+        after = self._decode_review_cursor(cursor) if cursor else None
+        if not await self.repo.check_active_product(product_id):
+            return {"items": [], "next_cursor": None}
+
+        reviews = await self.repo.get_reviews(product_id=product_id, limit=limit, after=after)
+        return self._review_page(reviews, limit)
+
+    async def stream_reviews_for_products(self, product_id: int, export_format: str, cursor: str | None = None):
+        logger.debug(f"Service: streaming reviews for product as {export_format} | product_id={product_id}")
+        after = self._decode_review_cursor(cursor) if cursor else None
+        active_product = await self.repo.check_active_product(product_id)
+
+        async def chunks():
+            if not active_product:
+                return
+            async for chunk in self.repo.stream_reviews(product_id=product_id, after=after):
+                yield chunk
+
+        return stream_rows(chunks(), ReviewSchema, export_format, filename=f"product_{product_id}_reviews")
 
     async def delete_review(self, review_id: int, buyer_id: int) -> dict:
         logger.debug(
             f"Service: delete review attempt | id={review_id}, buyer_id={buyer_id}"
         )
-        review = await self.repo.get_review(review_id)
+        review = await self.repo.get_review(review_id, for_update=True)
         if not review:
             logger.warning(f"Sevice: review not found | id={review_id}")
             raise HTTPException(
@@ -131,13 +198,15 @@ class ReviewService:
             )
 
         review.is_active = False
+        await self.repo.record_rating_change(review.product_id, review.grade, None)
+        invalidate_on_commit(self.db, f"review:{review.id}")
         await self.db.commit()
 
         logger.info(
             f"Service: review deactivated | id={review.id}, product_id={review.product_id}"
         )
 
-        await self.repo.update_product_rating(review.product_id)
+        rating_worker.enqueue(review.product_id)
 
         return {
             "message": f"Review {review.id} for product {review.product_id} successfully deleted"
@@ -145,7 +214,7 @@ class ReviewService:
 
     async def activate_review(self, review_id: int) -> dict:
         logger.debug(f"Service: activate review attempt | id={review_id}")
-        review = await self.repo.get_review(review_id, active=False)
+        review = await self.repo.get_review(review_id, active=False, for_update=True)
         if not review:
             logger.warning(f"Service: activate - review not found | id={review_id}")
             raise HTTPException(
@@ -154,15 +223,48 @@ class ReviewService:
             )
 
         review.is_active = True
+        await self.repo.record_rating_change(review.product_id, None, review.grade)
 
+        invalidate_on_commit(self.db, f"review:{review.id}")
         await self.db.commit()
 
         logger.info(
             f"Service: review activated | id={review.id}, product_id={review.product_id}"
         )
 
-        await self.repo.update_product_rating(review.product_id)
+        rating_worker.enqueue(review.product_id)
 
         return {
             "message": f"Review {review.id} for product {review.product_id} successfully activate"
         }
+
+    async def reconcile_ratings(self, batch_size: int = 10_000, fix: bool = True) -> dict:
+        """
+        Compares rating_sum, rating_count and the grade counts of every
+        product with its active reviews less the pending deltas, in id
+        ranges of `batch_size`, and with `fix` rewrites the ones that
+        drifted. Each range is its own
+        short transaction.
+        """
+        logger.debug(f"Service: rating reconcile | batch_size={batch_size}, fix={fix}")
+        max_id = await self.repo.get_max_product_id()
+        drifted, fixed = [], []
+        for first_id in range(1, max_id + 1, batch_size):
+            product_ids = await self.repo.find_rating_drift(first_id, first_id + batch_size)
+            await self.db.commit()
+            if not product_ids:
+                continue
+
+            drifted.extend(product_ids)
+            if fix:
+                fixed_ids = await self.repo.reconcile_ratings(product_ids)
+                await self.db.commit()
+                for product_id in fixed_ids:
+                    invalidate_product_listing(product_id)
+                fixed.extend(fixed_ids)
+
+        if drifted:
+            logger.warning(f"Service: rating drift | products={drifted[:100]}, total={len(drifted)}, fixed={len(fixed)}")
+        else:
+            logger.info(f"Service: no rating drift | products up to id={max_id}")
+        return {"checked_up_to": max_id, "drifted": len(drifted), "fixed": len(fixed)}
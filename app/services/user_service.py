@@ -5,15 +5,19 @@ from fastapi.security import OAuth2PasswordRequestForm
 
 from app.models.users_model import User as UserModel
 from app.repositories.user_repo import UserRepo
+from app.cache.invalidation import invalidate_on_commit
 from app.auth.security import (
     hash_password,
     verify_password,
     create_access_token,
     create_refresh_token,
+    password_needs_rehash,
+    rehash_in_background,
 )
+from app.auth.token_cache import verified_tokens
+from app.database import async_session_maker
 
 import jwt
-from app.config import SECRET_KEY, ALGORITHM
 from app.logger import logger
 
 class UserService:
@@ -34,7 +38,7 @@ class UserService:
             )
         db_user = UserModel(
             email=user_data_create["email"],
-            hashed_password=hash_password(user_data_create["password"]),
+            hashed_password=await hash_password(user_data_create["password"]),
             role=user_data_create["role"],
         )
         self.db.add(db_user)
@@ -56,7 +60,7 @@ class UserService:
                 detail="Incorrect email or password",
                 headers={"WWW-Authenticate": "Bearer"},
             )
-        if not verify_password(
+        if not await verify_password(
             form_data.password, user_db.hashed_password
         ):
             logger.warning(f'Service: invalid password | email={form_data.username}')
@@ -72,11 +76,25 @@ class UserService:
                 status_code=status.HTTP_400_BAD_REQUEST, detail="Account is deactivated"
             )
 
+        if password_needs_rehash(user_db.hashed_password):
+            logger.info(f'Service: password hash outdated, rehashing | id={user_db.id}')
+            user_id, old_hash = user_db.id, user_db.hashed_password
+
+            async def store(new_hash: str):
+                # the request's session is closed by the time the hash is ready
+                async with async_session_maker() as session:
+                    await UserRepo(session).update_password_hash(user_id, old_hash, new_hash)
+                    await session.commit()
+
+            rehash_in_background(form_data.password, store)
+
         access_token = create_access_token(
-            data={"sub": user_db.email, "role": user_db.role.value, "id": user_db.id}
+            data={"sub": user_db.email, "role": user_db.role.value, "id": user_db.id,
+                  "ver": user_db.token_version}
         )
         refresh_token = create_refresh_token(
-            data={"sub": user_db.email, "role": user_db.role.value, "id": user_db.id}
+            data={"sub": user_db.email, "role": user_db.role.value, "id": user_db.id,
+                  "ver": user_db.token_version}
         )
 
         logger.info(f'Service: successful login | id={user_db.id}')
@@ -96,7 +114,7 @@ class UserService:
             headers={"WWW-Authenticate": "Bearer"},
         )
         try:
-            payload = jwt.decode(refresh_token, SECRET_KEY, algorithms=[ALGORITHM])
+            payload = verified_tokens.decode(refresh_token)
             email: str = payload.get("sub")
             if not email:
                 logger.warning(f'Service: refresh - "sub" not found')
@@ -117,9 +135,14 @@ class UserService:
         if not user:
             logger.warning(f'Service: refresh - user not found')
             raise credentials_exception
+        version = payload.get("ver")
+        if version is not None and version != user.token_version:
+            logger.warning(f'Service: refresh - token revoked | id={user.id}')
+            raise credentials_exception
 
         access_token = create_access_token(
-            data={"sub": user.email, "role": user.role.value, "id": user.id}
+            data={"sub": user.email, "role": user.role.value, "id": user.id,
+                  "ver": user.token_version}
         )
         logger.info(f'Service: refresh successful | id={user.id}')
         return {"access_token": access_token, "token_type": "bearer"}
@@ -139,6 +162,9 @@ class UserService:
             )
 
         user_db.is_active = False
+        # revokes the tokens already issued, see get_current_user
+        user_db.token_version = UserModel.token_version + 1
+        invalidate_on_commit(self.db, f"user:{user_id}")
         await self.db.commit()
         await self.db.refresh(user_db)
 
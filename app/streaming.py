@@ -0,0 +1,69 @@
+import csv
+import io
+from typing import AsyncIterator, Iterable
+
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
+
+
+NDJSON_MEDIA_TYPE = 'application/x-ndjson'
+CSV_MEDIA_TYPE = 'text/csv'
+
+
+def negotiate_export_format(accept: str | None, requested: str | None = None) -> str:
+    """
+    'json', 'ndjson' or 'csv': an explicit ?format= wins over the Accept
+    header, plain JSON is the default.
+    """
+    if requested:
+        return requested
+
+    accept = accept or ''
+    if NDJSON_MEDIA_TYPE in accept:
+        return 'ndjson'
+    if CSV_MEDIA_TYPE in accept:
+        return 'csv'
+    return 'json'
+
+
+async def _ndjson(chunks: AsyncIterator[Iterable], schema: type[BaseModel]) -> AsyncIterator[bytes]:
+    async for chunk in chunks:
+        yield b''.join(schema.model_validate(row).model_dump_json().encode() + b'\n' for row in chunk)
+
+
+async def _csv(chunks: AsyncIterator[Iterable], schema: type[BaseModel]) -> AsyncIterator[bytes]:
+    fields = list(schema.model_fields)
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+
+    writer.writerow(fields)
+    async for chunk in chunks:
+        for row in chunk:
+            item = schema.model_validate(row).model_dump(mode='json')
+            writer.writerow([item[field] for field in fields])
+        yield buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+
+    if buffer.tell():
+        yield buffer.getvalue().encode()
+
+
+def stream_rows(
+        chunks: AsyncIterator[Iterable],
+        schema: type[BaseModel],
+        export_format: str,
+        filename: str
+) -> StreamingResponse:
+    """
+    Writes rows to the response chunk by chunk as they are read, so memory
+    use does not depend on how many rows there are. `chunks` yields
+    batches of rows that `schema` can validate.
+    """
+    if export_format == 'csv':
+        return StreamingResponse(
+            _csv(chunks, schema),
+            media_type=CSV_MEDIA_TYPE,
+            headers={'Content-Disposition': f'attachment; filename="{filename}.csv"'}
+        )
+    return StreamingResponse(_ndjson(chunks, schema), media_type=NDJSON_MEDIA_TYPE)
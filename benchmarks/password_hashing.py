@@ -0,0 +1,68 @@
+"""
+Login cost of every bcrypt cost factor: the time of one hash and the
+verifications per second the PasswordHashPool sustains, per core, with
+all workers busy. Pick BCRYPT_ROUNDS / BCRYPT_TARGET_MS from it; the
+startup calibration result for the given target is printed too.
+
+    python -m benchmarks.password_hashing --rounds 10 14 --workers 4 --target-ms 250
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import time
+
+from passlib.context import CryptContext
+
+from app.auth.hash_pool import PasswordHashPool
+from app.auth.security import calibrate_bcrypt_rounds
+
+
+PASSWORD = 'correct horse battery staple'
+
+
+async def measure(rounds: int, workers: int, seconds: float) -> tuple[float, float]:
+    context = CryptContext(schemes=['bcrypt'], bcrypt__default_rounds=rounds)
+    hashed = context.hash(PASSWORD)
+
+    single = []
+    for _ in range(3):
+        started = time.perf_counter()
+        context.verify(PASSWORD, hashed)
+        single.append((time.perf_counter() - started) * 1000)
+
+    pool = PasswordHashPool(workers=workers, queue_timeout=3600)
+    done = 0
+    deadline = time.perf_counter() + seconds
+
+    async def client():
+        nonlocal done
+        while time.perf_counter() < deadline:
+            await pool.run(context.verify, PASSWORD, hashed)
+            done += 1
+
+    started = time.perf_counter()
+    # twice as many clients as workers keeps the pool saturated
+    await asyncio.gather(*(client() for _ in range(workers * 2)))
+    elapsed = time.perf_counter() - started
+    return statistics.median(single), done / elapsed
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rounds', type=int, nargs=2, default=(10, 14), metavar=('FROM', 'TO'))
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--seconds', type=float, default=5)
+    parser.add_argument('--target-ms', type=float, default=250)
+    args = parser.parse_args()
+
+    print(f'{"rounds":>6} {"hash ms":>9} {"logins/s":>9} {"per core":>9}')
+    for rounds in range(args.rounds[0], args.rounds[1] + 1):
+        single_ms, throughput = await measure(rounds, args.workers, args.seconds)
+        print(f'{rounds:>6} {single_ms:>9.1f} {throughput:>9.1f} {throughput / args.workers:>9.2f}')
+
+    print(f'calibrated for {args.target_ms:.0f}ms: {calibrate_bcrypt_rounds(args.target_ms, args.rounds[0])} rounds')
+
+
+if __name__ == '__main__':
+    asyncio.run(main())